@@ -1,22 +1,93 @@
 """Example demonstrating streaming capabilities of the Vault PKI Agent."""
 
 import asyncio
+import io
 import os
 import sys
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, Dict, List
 
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
 
-from agent.vault_pki_agent import VaultPKIAgent
+from agent.vault_pki_agent import EventKind, VaultPKIAgent
+
+
+@dataclass
+class StreamState:
+    """State accumulated by the event handlers while streaming one query."""
+
+    chunks: List[str] = field(default_factory=list)
+    # Output is buffered per query so concurrent queries don't interleave
+    out: io.StringIO = field(default_factory=io.StringIO)
+
+
+# Event handlers based on the Strands Agent SDK documentation. Each returns
+# True when the stream should stop.
+
+
+def _on_init_event_loop(event: Dict[str, Any], state: StreamState) -> bool:
+    if event["init_event_loop"]:
+        print("🔄 Event loop initialized", file=state.out)
+    return False
+
+
+def _on_start_event_loop(event: Dict[str, Any], state: StreamState) -> bool:
+    if event["start_event_loop"]:
+        print("▶️ Event loop cycle starting", file=state.out)
+    return False
+
+
+def _on_data(event: Dict[str, Any], state: StreamState) -> bool:
+    # Collect text output
+    text_chunk = event["data"]
+    print(text_chunk, end="", file=state.out)
+    state.chunks.append(text_chunk)
+    return False
+
+
+def _on_tool(event: Dict[str, Any], state: StreamState) -> bool:
+    # Show tool usage
+    tool_name = event["current_tool_use"].get("name")
+    if tool_name:
+        tool_input = event["current_tool_use"].get("input", {})
+        print(f"\n🔧 Using tool: {tool_name}", file=state.out)
+        if tool_input:
+            print(f"   Input: {tool_input}", file=state.out)
+    return False
+
+
+def _on_complete(event: Dict[str, Any], state: StreamState) -> bool:
+    if event["complete"]:
+        print("\n✅ Cycle completed", file=state.out)
+    return False
+
+
+def _on_result(event: Dict[str, Any], state: StreamState) -> bool:
+    print("\n🎯 Final result received", file=state.out)
+    return False
+
+
+def _on_error(event: Dict[str, Any], state: StreamState) -> bool:
+    print(f"\n❌ Error: {event['message']}", file=state.out)
+    return True
+
+
+EVENT_HANDLERS: Dict[EventKind, Callable[[Dict[str, Any], StreamState], bool]] = {
+    EventKind.INIT_EVENT_LOOP: _on_init_event_loop,
+    EventKind.START_EVENT_LOOP: _on_start_event_loop,
+    EventKind.DATA: _on_data,
+    EventKind.TOOL_USE: _on_tool,
+    EventKind.COMPLETE: _on_complete,
+    EventKind.RESULT: _on_result,
+    EventKind.ERROR: _on_error,
+}
 
 
 async def streaming_example():
     """Example showing how to use the streaming query method."""
 
-    # Load environment variables
-    load_dotenv()
-
     # Initialize the agent
     agent = VaultPKIAgent()
 
@@ -28,57 +99,43 @@ async def streaming_example():
         "Who issued the certificate test.example.com",
     ]
 
-    for i, query in enumerate(queries, 1):
-        print(f"\n{'=' * 60}")
-        print(f"Query {i}: {query}")
-        print("=" * 60)
+    async def run_one(i: int, query: str) -> str:
+        """Run one query, returning its output once complete."""
+        state = StreamState()
+        print(f"\n{'=' * 60}", file=state.out)
+        print(f"Query {i}: {query}", file=state.out)
+        print("=" * 60, file=state.out)
 
         # Process streaming response
         try:
-            full_response = ""
-            async for event in agent.query_stream(query):
-                # Handle different event types based on Strands Agent SDK documentation
-
-                if "init_event_loop" in event and event["init_event_loop"]:
-                    print("🔄 Event loop initialized")
-
-                elif "start_event_loop" in event and event["start_event_loop"]:
-                    print("▶️ Event loop cycle starting")
-
-                elif "data" in event:
-                    # Stream text output in real-time
-                    text_chunk = event["data"]
-                    print(text_chunk, end="", flush=True)
-                    full_response += text_chunk
-
-                elif "current_tool_use" in event and event["current_tool_use"].get(
-                    "name"
-                ):
-                    # Show tool usage
-                    tool_name = event["current_tool_use"]["name"]
-                    tool_input = event["current_tool_use"].get("input", {})
-                    print(f"\n🔧 Using tool: {tool_name}")
-                    if tool_input:
-                        print(f"   Input: {tool_input}")
-
-                elif "complete" in event and event["complete"]:
-                    print("\n✅ Cycle completed")
-
-                elif "result" in event:
-                    print("\n🎯 Final result received")
-
-                elif "error" in event:
-                    print(f"\n❌ Error: {event['message']}")
-                    break
-
-            print(f"\n\n📝 Full Response Length: {len(full_response)} characters")
+            stream = agent.query_stream(query)
+            try:
+                async for event in stream:
+                    handler = EVENT_HANDLERS.get(event["_kind"])
+                    if handler is not None and handler(event, state):
+                        break
+            finally:
+                # Release the agent and its connection as soon as we stop
+                await stream.aclose()
+
+            full_response = "".join(state.chunks)
+            print(
+                f"\n\n📝 Full Response Length: {len(full_response)} characters",
+                file=state.out,
+            )
 
         except Exception as e:
-            print(f"\n❌ Exception occurred: {str(e)}")
+            print(f"\n❌ Exception occurred: {str(e)}", file=state.out)
+
+        return state.out.getvalue()
 
-        # Wait a bit between queries for better readability
-        if i < len(queries):
-            await asyncio.sleep(1)
+    # The queries are independent, so run them concurrently and print each
+    # one's output in order as a block
+    results = await asyncio.gather(
+        *(run_one(i, query) for i, query in enumerate(queries, 1))
+    )
+    for output in results:
+        print(output)
 
 
 async def compare_methods():
@@ -88,7 +145,6 @@ async def compare_methods():
     print("COMPARISON: Regular Query vs Streaming Query")
     print("=" * 80)
 
-    load_dotenv()
     agent = VaultPKIAgent()
 
     query = "List all PKI secrets engines in Vault"
@@ -96,11 +152,11 @@ async def compare_methods():
     # Test regular query method
     print("\n🔸 Regular Query Method:")
     print("-" * 40)
-    start_time = asyncio.get_event_loop().time()
+    start_time = perf_counter()
 
     try:
         regular_response = await agent.query(query)
-        regular_time = asyncio.get_event_loop().time() - start_time
+        regular_time = perf_counter() - start_time
         print(f"Response: {regular_response}")
         print(f"⏱️ Time taken: {regular_time:.2f} seconds")
     except Exception as e:
@@ -109,27 +165,32 @@ async def compare_methods():
     # Test streaming query method
     print("\n🔸 Streaming Query Method:")
     print("-" * 40)
-    start_time = asyncio.get_event_loop().time()
+    start_time = perf_counter()
 
     try:
-        streaming_response = ""
+        chunks: List[str] = []
         first_chunk_time = None
 
-        async for event in agent.query_stream(query):
-            if "data" in event:
-                if first_chunk_time is None:
-                    first_chunk_time = asyncio.get_event_loop().time() - start_time
-                    print(
-                        f"⚡ First chunk received after: {first_chunk_time:.2f} seconds"
-                    )
-
-                chunk = event["data"]
-                print(chunk, end="", flush=True)
-                streaming_response += chunk
-            elif "result" in event:
-                break
-
-        total_streaming_time = asyncio.get_event_loop().time() - start_time
+        stream = agent.query_stream(query)
+        try:
+            async for event in stream:
+                kind = event["_kind"]
+                if kind is EventKind.DATA:
+                    if first_chunk_time is None:
+                        first_chunk_time = perf_counter() - start_time
+                        print(
+                            f"⚡ First chunk received after: {first_chunk_time:.2f} seconds"
+                        )
+
+                    chunk = event["data"]
+                    print(chunk, end="", flush=True)
+                    chunks.append(chunk)
+                elif kind is EventKind.RESULT:
+                    break
+        finally:
+            await stream.aclose()
+
+        total_streaming_time = perf_counter() - start_time
         print(f"\n⏱️ Total streaming time: {total_streaming_time:.2f} seconds")
 
         if first_chunk_time:
@@ -2,11 +2,27 @@
 
 import asyncio
 import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
 import streamlit as st
-from dotenv import load_dotenv
 
-from src.agent.vault_pki_agent import VaultPKIAgent
+from src.agent.vault_pki_agent import EventKind, VaultPKIAgent, get_background_loop
+from src.ui.agent_factory import get_agent
+from src.ui.example_prompts import get_prompt_max_tokens
 from src.ui.streamlit_app import (
+    MAX_QUERY_HISTORY,
     setup_page_config,
     render_header,
     render_sidebar,
@@ -17,11 +33,73 @@ from src.ui.streamlit_app import (
     render_footer,
 )
 
+T = TypeVar("T")
+
+# Upper bound on events buffered between the agent stream and the UI
+STREAM_QUEUE_SIZE = 32
+
+_STREAM_END = object()
+
+
+class _StreamFailure:
+    """Carries an exception raised by the producer over to the consumer."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+async def _produce(iterator: AsyncIterator[T], queue: asyncio.Queue) -> None:
+    """Copy items from an async iterator into a bounded queue.
+
+    The iterator is closed explicitly when production ends or is cancelled,
+    so the agent stream and its HTTP response are released right away
+    rather than whenever the generator is garbage collected.
+    """
+    try:
+        async for item in iterator:
+            await queue.put(item)
+    except Exception as e:
+        await queue.put(_StreamFailure(e))
+    else:
+        await queue.put(_STREAM_END)
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def iterate_async(
+    iterator: AsyncIterator[T], maxsize: int = STREAM_QUEUE_SIZE
+) -> Iterator[T]:
+    """Consume an async iterator from the script thread via the background loop.
+
+    A producer task on the shared event loop drains the iterator into a queue
+    of at most ``maxsize`` items, so the stream keeps flowing while the UI
+    renders and blocks only when the UI falls that far behind. Items are
+    handled on the script thread, so Streamlit calls stay there. Closing the
+    generator early cancels the producer.
+    """
+    loop = get_background_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    producer = asyncio.run_coroutine_threadsafe(_produce(iterator, queue), loop)
+    try:
+        while True:
+            item = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, _StreamFailure):
+                raise item.error
+            yield item
+    finally:
+        producer.cancel()
+
 
 def load_environment():
-    """Load environment variables from .env file."""
-    load_dotenv()
+    """Verify required environment variables.
 
+    The .env file itself is loaded once when the agent module is imported,
+    rather than on every Streamlit rerun.
+    """
     # Verify required environment variables
     required_vars = ["OPENAI_API_KEY"]
     missing_vars = []
@@ -39,18 +117,133 @@ def initialize_session_state():
     """Initialize Streamlit session state variables."""
     if "agent" not in st.session_state:
         try:
-            st.session_state.agent = VaultPKIAgent()
+            st.session_state.agent = get_agent()
             st.session_state.mcp_server_url = st.session_state.agent.mcp_server_url
         except Exception as e:
             st.error(f"Failed to initialize agent: {str(e)}")
             st.stop()
 
     if "query_history" not in st.session_state:
-        st.session_state.query_history = []
+        st.session_state.query_history = deque(maxlen=MAX_QUERY_HISTORY)
+
+    # Defaults the sidebar reads on every rerun
+    st.session_state.setdefault("mcp_server_url", "Not configured")
+    st.session_state.setdefault("streaming_enabled", True)
+
+
+RESPONSE_HEADER = "### Response"
+TOOLS_LABEL = "🔧 Tools Used"
+
 
+def store_query_outcome(
+    query_text: str,
+    response: str,
+    tools_used: List[str],
+    success: Optional[bool] = None,
+) -> None:
+    """Record a finished query in session state.
 
-async def process_query_async(agent: VaultPKIAgent, query_text: str) -> None:
-    """Process a query asynchronously with real-time streaming and update session state.
+    This is the only place a query writes session state, and it runs once the
+    response is complete rather than while it is still streaming.
+
+    Args:
+        query_text: User query text
+        response: Final response text
+        tools_used: Tool labels shown for the query
+        success: Outcome for the history; derived from the response if None
+    """
+    if success is None:
+        success = bool(response and not response.startswith("Error"))
+    st.session_state.last_response = response
+    st.session_state.last_tools_used = tools_used
+    add_to_query_history(query_text, success)
+
+
+@dataclass
+class StreamState:
+    """Mutable state shared by the stream event handlers for one query."""
+
+    status_placeholder: Any
+    # Slot that receives the Tools Used expander once a tool runs
+    tool_placeholder: Any
+    # List inside that expander; created with it on the first tool
+    tool_list: Any = None
+    current_tools: List[str] = field(default_factory=list)
+    # Track unique tool names to prevent duplicates
+    current_tool_names: Set[str] = field(default_factory=set)
+    error_message: Optional[str] = None
+
+
+def _on_tool(event: Dict[str, Any], state: StreamState) -> bool:
+    """Show tool usage."""
+    tool_use_info = event["current_tool_use"]
+    if not tool_use_info.get("name"):
+        return False
+
+    if isinstance(tool_use_info, dict):
+        tool_name = tool_use_info.get("name", "Unknown Tool")
+
+        # Tool events repeat while the input streams in; only do work when
+        # this tool name hasn't been seen before
+        if tool_name in state.current_tool_names:
+            return False
+
+        state.current_tool_names.add(tool_name)
+        state.current_tools.append(f"🔧 **{tool_name}**")
+        if state.tool_list is None:
+            state.tool_list = state.tool_placeholder.expander(
+                TOOLS_LABEL, expanded=True
+            ).empty()
+        state.tool_list.markdown("\n".join(state.current_tools))
+    return False
+
+
+def _on_init_event_loop(event: Dict[str, Any], state: StreamState) -> bool:
+    if event["init_event_loop"]:
+        state.status_placeholder.info("🔄 Initializing agent...")
+    return False
+
+
+def _on_start_event_loop(event: Dict[str, Any], state: StreamState) -> bool:
+    if event["start_event_loop"]:
+        state.status_placeholder.info("▶️ Starting query processing...")
+    return False
+
+
+def _on_complete(event: Dict[str, Any], state: StreamState) -> bool:
+    if event["complete"]:
+        state.status_placeholder.success("✅ Processing cycle completed")
+    return False
+
+
+def _on_result(event: Dict[str, Any], state: StreamState) -> bool:
+    state.status_placeholder.success("🎯 Query completed successfully!")
+    return True
+
+
+def _on_error(event: Dict[str, Any], state: StreamState) -> bool:
+    state.status_placeholder.error(f"❌ Error: {event['message']}")
+    state.error_message = event.get("message", "Unknown error occurred")
+    return True
+
+
+# Handlers for non-text stream events, keyed by event kind. Each returns True
+# when the stream should stop.
+EVENT_HANDLERS: Dict[EventKind, Callable[[Dict[str, Any], StreamState], bool]] = {
+    EventKind.TOOL_USE: _on_tool,
+    EventKind.INIT_EVENT_LOOP: _on_init_event_loop,
+    EventKind.START_EVENT_LOOP: _on_start_event_loop,
+    EventKind.COMPLETE: _on_complete,
+    EventKind.RESULT: _on_result,
+    EventKind.ERROR: _on_error,
+}
+
+
+def process_query_streaming(agent: VaultPKIAgent, query_text: str) -> None:
+    """Process a query with real-time streaming and update session state.
+
+    Text chunks are handed to ``st.write_stream`` which appends them
+    incrementally; tool and status events update their own placeholders.
 
     Args:
         agent: VaultPKIAgent instance
@@ -59,102 +252,61 @@ async def process_query_async(agent: VaultPKIAgent, query_text: str) -> None:
     try:
         # Create placeholders for streaming output
         status_placeholder = st.empty()
-        response_placeholder = st.empty()
+        response_container = st.container()
+        # Filled only if a tool runs
         tool_placeholder = st.empty()
 
         status_placeholder.info("🔄 Processing your query...")
 
-        full_response = ""
-        current_tools = []
-        current_tool_names = set()  # Track unique tool names to prevent duplicates
-
-        async for event in agent.query_stream(query_text):
-            # Handle different event types with error checking
-            try:
-                if "data" in event:
-                    # Stream text output in real-time
-                    text_chunk = event["data"]
-                    if isinstance(text_chunk, str):
-                        full_response += text_chunk
-                        response_placeholder.markdown(f"### Response\n{full_response}")
-
-                elif "current_tool_use" in event and event["current_tool_use"].get(
-                    "name"
-                ):
-                    # Show tool usage
-                    tool_use_info = event["current_tool_use"]
-                    if isinstance(tool_use_info, dict):
-                        tool_name = tool_use_info.get("name", "Unknown Tool")
-                        tool_input = tool_use_info.get("input", {})
-
-                        # Add to current tools if not already there (deduplicate by tool name)
-                        tool_info = f"🔧 Using: **{tool_name}**"
-                        if tool_input:
-                            # Show key parameters for context
-                            key_params = []
-                            # Check if tool_input is a dictionary before calling .items()
-                            if isinstance(tool_input, dict):
-                                for key, value in tool_input.items():
-                                    if key in [
-                                        "pki_mount_path",
-                                        "vault_certificate_subject",
-                                        "vault_pki_path",
-                                    ]:
-                                        key_params.append(f"{key}: {value}")
-                            elif isinstance(tool_input, str):
-                                # If tool_input is a string, just show it directly
-                                key_params.append(f"input: {tool_input}")
-
-                            if key_params:
-                                tool_info += f" ({', '.join(key_params)})"
-
-                        # Only add if this tool name hasn't been seen before
-                        if tool_name not in current_tool_names:
-                            current_tool_names.add(tool_name)
-                            current_tools.append(f"🔧 **{tool_name}**")
-                            tool_placeholder.markdown(
-                                "#### Tools Used\n" + "\n".join(current_tools)
-                            )
-
-                elif "init_event_loop" in event and event["init_event_loop"]:
-                    status_placeholder.info("🔄 Initializing agent...")
-
-                elif "start_event_loop" in event and event["start_event_loop"]:
-                    status_placeholder.info("▶️ Starting query processing...")
-
-                elif "complete" in event and event["complete"]:
-                    status_placeholder.success("✅ Processing cycle completed")
-
-                elif "result" in event:
-                    status_placeholder.success("🎯 Query completed successfully!")
-                    break
-
-                elif "error" in event:
-                    status_placeholder.error(f"❌ Error: {event['message']}")
-                    full_response = event.get("message", "Unknown error occurred")
-                    break
-
-            except Exception as event_error:
-                # Handle individual event processing errors
-                st.warning(f"Warning: Error processing event - {str(event_error)}")
-                continue
+        state = StreamState(status_placeholder, tool_placeholder)
 
-        # Store final response and update history
-        st.session_state.last_response = full_response
-        st.session_state.last_tools_used = current_tools
-        add_to_query_history(
-            query_text, bool(full_response and not full_response.startswith("Error"))
+        def text_chunks() -> Iterator[str]:
+            """Yield response text while handling tool and status events.
+
+            ``query_stream`` already coalesces model tokens into batches, so
+            each text event is passed on as it arrives.
+            """
+            stream = agent.query_stream(
+                query_text, max_tokens=get_prompt_max_tokens(query_text)
+            )
+            for event in iterate_async(stream):
+                # Handle different event types with error checking
+                try:
+                    kind = event["_kind"]
+                    # Fast path for text, which makes up most of the stream
+                    if kind is EventKind.DATA:
+                        text_chunk = event["data"]
+                        if isinstance(text_chunk, str):
+                            yield text_chunk
+                        continue
+
+                    handler = EVENT_HANDLERS.get(kind)
+                    if handler is not None and handler(event, state):
+                        break
+
+                except Exception as event_error:
+                    # Handle individual event processing errors
+                    st.warning(f"Warning: Error processing event - {str(event_error)}")
+                    continue
+
+        with response_container:
+            st.markdown(RESPONSE_HEADER)
+            streamed = st.write_stream(text_chunks())
+
+        full_response = state.error_message or (
+            streamed if isinstance(streamed, str) else ""
         )
 
+        # Store final response and update history
+        store_query_outcome(query_text, full_response, state.current_tools)
+
     except Exception as e:
         error_message = f"Error processing query: {str(e)}"
         st.error(error_message)
-        st.session_state.last_response = error_message
-        st.session_state.last_tools_used = []
-        add_to_query_history(query_text, False)
+        store_query_outcome(query_text, error_message, [], success=False)
 
 
-async def process_query_regular(agent: VaultPKIAgent, query_text: str) -> None:
+def process_query_regular(agent: VaultPKIAgent, query_text: str) -> None:
     """Process a query using the regular (non-streaming) method.
 
     Args:
@@ -163,23 +315,20 @@ async def process_query_regular(agent: VaultPKIAgent, query_text: str) -> None:
     """
     try:
         with st.spinner("Processing your query..."):
-            response = await agent.query(query_text)
-            st.session_state.last_response = response
-            st.session_state.last_tools_used = []  # No tool visibility in regular mode
-            add_to_query_history(
-                query_text, bool(response and not response.startswith("Error"))
+            response = agent.query_sync(
+                query_text, max_tokens=get_prompt_max_tokens(query_text)
             )
+            # No tool visibility in regular mode
+            store_query_outcome(query_text, response, [])
 
             # Show result immediately
-            st.markdown("### Response")
+            st.markdown(RESPONSE_HEADER)
             st.markdown(response)
 
     except Exception as e:
         error_message = f"Error processing query: {str(e)}"
         st.error(error_message)
-        st.session_state.last_response = error_message
-        st.session_state.last_tools_used = []
-        add_to_query_history(query_text, False)
+        store_query_outcome(query_text, error_message, [], success=False)
 
 
 def main():
@@ -223,10 +372,10 @@ def main():
         if query_text:
             if use_streaming:
                 # Run streaming query processing
-                asyncio.run(process_query_async(st.session_state.agent, query_text))
+                process_query_streaming(st.session_state.agent, query_text)
             else:
                 # Run regular query processing (legacy mode)
-                asyncio.run(process_query_regular(st.session_state.agent, query_text))
+                process_query_regular(st.session_state.agent, query_text)
 
         # Show previous results if available (when not actively processing)
         if "last_response" in st.session_state and query_text is None:
@@ -248,8 +397,9 @@ def main():
         # Query history
         # render_query_history()
 
-        # Connection status
-        show_connection_status()
+        # Connection status, only when the sidebar asked for a health check
+        if st.session_state.get("health_check_requested"):
+            show_connection_status()
 
     # Footer
     render_footer()
@@ -1,15 +1,181 @@
 """Vault PKI Query Agent using AWS Strands Agent SDK."""
 
+import asyncio
+import atexit
+import functools
+import importlib.util
+import logging
 import os
-from typing import Optional, AsyncIterator, Dict, Any
+import threading
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Optional, AsyncIterator, Dict, Any, List
 
+import httpx
 from dotenv import load_dotenv
 from strands import Agent
 from strands.agent import AgentResult
+from strands.types.exceptions import MaxTokensReachedException
 from strands.tools.mcp.mcp_client import MCPClient
 from strands.models.openai import OpenAIModel
 from mcp.client.streamable_http import streamablehttp_client
 
+try:
+    import uvloop
+except ImportError:  # optional speedup; not available on Windows
+    uvloop = None
+
+# HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 without it
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Sent on every MCP request so intermediate proxies pass streamed tool
+# output straight through instead of caching or buffering it
+_MCP_STREAM_HEADERS = {"Cache-Control": "no-cache"}
+
+# Read .env once when the module is first imported. Entry points (the
+# Streamlit app, examples, scripts) import this module, so they don't need to
+# load it again themselves.
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# System prompt for PKI domain expertise. Tool usage guidance lives in the MCP
+# tool descriptions, which are sent alongside it. The prompt is kept
+# byte-identical across requests, but OpenAI only caches prompt prefixes of
+# 1024 tokens or more and this prompt is far below that, so in practice it is
+# not served from the prompt cache unless the tool definitions take the prefix
+# past the threshold.
+_SYSTEM_PROMPT = """
+You are a HashiCorp Vault PKI expert assistant. You help users query and understand
+certificate information from Vault PKI secrets engines and related audit events.
+
+Use the available tools to get current data from Vault. Include expiration dates,
+serial numbers and issuers where relevant, explain security implications, and suggest
+follow-up actions for expiring or revoked certificates.
+
+**IMPORTANT: Format all structured data in markdown tables for better readability.**
+"""
+
+# Model settings. The default leaves room for long certificate tables;
+# callers can pass a per-query max_tokens for replies known to be short.
+_MODEL_ID = "gpt-4o"
+_DEFAULT_MAX_TOKENS = 1000
+_TEMPERATURE = 0.7
+
+# Appended to the text streamed so far when a reply hits its max_tokens cap
+_TRUNCATION_NOTICE = (
+    "\n\n_Response truncated: the answer reached its length limit. "
+    "Try a narrower query for the full result._"
+)
+
+# Returned when the agent produces no text
+_FALLBACK_RESPONSE = "I apologize, but I encountered an issue processing your request. Please try again or contact support."
+
+# Each flushed batch of streamed text may hold this many times more chunks
+# than the previous one, up to ``max_batch``
+_BATCH_SIZE_GROWTH_FACTOR = 2
+
+
+@functools.lru_cache(maxsize=8)
+def _get_model(
+    api_key: str, model_id: str, max_tokens: int, temperature: float
+) -> OpenAIModel:
+    """Return a shared OpenAIModel for the given settings.
+
+    Agents built with the same API key and parameters reuse one model object
+    (and its client configuration) instead of each creating their own. The
+    API key is part of the cache key, so it must be a plain string.
+    """
+    return OpenAIModel(
+        client_args={"api_key": api_key},
+        model_id=model_id,
+        params={"max_tokens": max_tokens, "temperature": temperature},
+    )
+
+
+def _mcp_http_client(
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    auth: Optional[httpx.Auth] = None,
+) -> httpx.AsyncClient:
+    """Create the HTTP client for the MCP transport, using HTTP/2 if available.
+
+    Uses the MCP SDK's default timeouts (30s, with a 300s read timeout for
+    long-lived streams) and follows redirects, so a server behind a
+    redirecting proxy stays reachable whichever SDK version is installed.
+    """
+    return httpx.AsyncClient(
+        headers={**_MCP_STREAM_HEADERS, **(headers or {})},
+        timeout=timeout or httpx.Timeout(30.0, read=300.0),
+        auth=auth,
+        follow_redirects=True,
+        http2=_HTTP2_AVAILABLE,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop used to run agent coroutines.
+
+    The loop is started once in a daemon thread and kept alive, so the HTTP
+    connection pools inside the OpenAI and MCP clients survive between
+    queries instead of being torn down by ``asyncio.run``. uvloop is used
+    when installed for lower per-event scheduling overhead while streaming.
+    """
+    loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+    threading.Thread(
+        target=loop.run_forever, name="vault-agent-loop", daemon=True
+    ).start()
+    return loop
+
+
+class EventKind(IntEnum):
+    """Kind of a streaming event, stored under the ``"_kind"`` key."""
+
+    OTHER = 0
+    DATA = 1
+    TOOL_USE = 2
+    INIT_EVENT_LOOP = 3
+    START_EVENT_LOOP = 4
+    COMPLETE = 5
+    RESULT = 6
+    ERROR = 7
+
+
+def classify_event(event: Dict[str, Any]) -> EventKind:
+    """Classify a streaming event by its payload key, most frequent first."""
+    if "data" in event:
+        return EventKind.DATA
+    if "current_tool_use" in event:
+        return EventKind.TOOL_USE
+    if "init_event_loop" in event:
+        return EventKind.INIT_EVENT_LOOP
+    if "start_event_loop" in event:
+        return EventKind.START_EVENT_LOOP
+    if "complete" in event:
+        return EventKind.COMPLETE
+    if "result" in event:
+        return EventKind.RESULT
+    if "error" in event:
+        return EventKind.ERROR
+    return EventKind.OTHER
+
+
+def _data_event(chunks: List[str]) -> Dict[str, Any]:
+    """Build a single text event from a batch of streamed chunks."""
+    return {"data": "".join(chunks), "_kind": EventKind.DATA}
+
+
+def _log_usage(result: AgentResult) -> None:
+    """Log token usage for a completed query."""
+    usage = result.metrics.accumulated_usage
+    logger.info(
+        "Query token usage: input=%s output=%s",
+        usage.get("inputTokens"),
+        usage.get("outputTokens"),
+    )
+
 
 class VaultPKIAgent:
     """Main agent for processing Vault PKI queries using natural language."""
@@ -28,7 +194,11 @@ class VaultPKIAgent:
         )
 
         # Initialize MCP client using Strands Agent SDK pattern
-        self.mcp_client = MCPClient(lambda: streamablehttp_client(self.mcp_server_url))
+        self.mcp_client = MCPClient(
+            lambda: streamablehttp_client(
+                self.mcp_server_url, httpx_client_factory=_mcp_http_client
+            )
+        )
 
         # Initialize OpenAI model
         api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
@@ -37,99 +207,160 @@ class VaultPKIAgent:
                 "OpenAI API key is required. Set OPENAI_API_KEY environment variable."
             )
 
-        self.model = OpenAIModel(
-            client_args={"api_key": api_key},
-            model_id="gpt-4o",
-            params={"max_tokens": 1000, "temperature": 0.7},
-        )
+        self._api_key = api_key
+        self.model = _get_model(api_key, _MODEL_ID, _DEFAULT_MAX_TOKENS, _TEMPERATURE)
 
         # System prompt for PKI domain expertise
-        self.system_prompt = self._get_system_prompt()
+        self.system_prompt = _SYSTEM_PROMPT
 
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for the agent."""
-        return """
-You are a HashiCorp Vault PKI expert assistant. You help users query and understand 
-certificate information from Vault PKI secrets engines and related audit events.
+        # Open the MCP session once and reuse the discovered tools and agent
+        # for every query instead of reconnecting per request. The tool list
+        # is re-discovered after a TTL so server-side changes are picked up.
+        self.mcp_client.__enter__()
+        try:
+            self._cache_ttl_seconds = 300
+            self._tools_cache = self.mcp_client.list_tools_sync()
+            self._tools_cache_expiry = time.monotonic() + self._cache_ttl_seconds
+
+            # An Agent holds per-invocation state, so concurrent queries each
+            # borrow their own; idle agents are kept for reuse
+            self._idle_agents: List[Agent] = [self._create_agent()]
+        except Exception:
+            # The atexit hook is not registered yet; close the session here
+            self.mcp_client.__exit__(None, None, None)
+            raise
+        self._closed = False
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Close the MCP session opened in ``__init__``. Safe to call repeatedly."""
+        if self._closed:
+            return
+        self._closed = True
+        # Drop the exit hook so a closed agent is not kept alive until exit
+        atexit.unregister(self.close)
+        self.mcp_client.__exit__(None, None, None)
+
+    async def aclose(self) -> None:
+        """Async variant of :meth:`close` for use from coroutines."""
+        self.close()
+
+    async def __aenter__(self) -> "VaultPKIAgent":
+        """Use the agent as ``async with VaultPKIAgent() as agent``.
+
+        The MCP session is already open once construction succeeds; leaving
+        the block closes it.
+        """
+        return self
 
-Your capabilities include:
-- Finding certificates expiring within specified timeframes
-- Identifying revoked certificates and their status
-- Filtering certificates by PKI secrets engine
-- Retrieving audit trails for certificate lifecycle events
-- Identifying who issued specific certificates
-
-Available MCP tools:
-- list_pki_secrets_engines: Lists all PKI secrets engines in Vault
-- list_certificates: Lists certificates from a specific PKI engine (requires pki_mount_path parameter)
-- filter_pki_audit_events: Searches audit events for certificate operations (requires vault_certificate_subject and vault_pki_path parameters)
-
-When responding:
-- Use the available MCP tools to get current data from Vault
-- Provide clear, actionable information about certificate status
-- Include relevant details like expiration dates, serial numbers, and issuer information
-- Explain security implications when appropriate
-- Suggest follow-up actions for expiring or revoked certificates
-- Always prioritize security and operational clarity in your responses
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
 
-**IMPORTANT: Format all structured data in markdown tables for better readability.**
+    async def _get_tools(self) -> List[Any]:
+        """Return the cached MCP tools, re-listing them once the TTL expires.
 
-For certificate expiration queries, use list_certificates on all PKI engines and filter results.
-For revocation queries, use list_certificates and look for revoked certificates.
-For audit queries, use filter_pki_audit_events with the certificate subject and PKI path.
-For PKI engine queries, use list_certificates on the specific engine.
-"""
+        Idle agents were built with the old tools, so a refresh discards them
+        and they are rebuilt on demand.
+        """
+        if time.monotonic() >= self._tools_cache_expiry:
+            # list_tools_sync blocks on an HTTP round-trip; keep it off the loop
+            self._tools_cache = await asyncio.to_thread(self.mcp_client.list_tools_sync)
+            self._tools_cache_expiry = time.monotonic() + self._cache_ttl_seconds
+            self._idle_agents.clear()
+        return self._tools_cache
+
+    def _create_agent(self) -> Agent:
+        """Create an Agent bound to the shared model and cached MCP tools."""
+        return Agent(
+            model=self.model,
+            tools=self._tools_cache,
+            system_prompt=self.system_prompt,
+        )
+
+    @asynccontextmanager
+    async def _borrow_agent(
+        self, max_tokens: Optional[int] = None
+    ) -> AsyncIterator[Agent]:
+        """Lend an idle agent with empty history, creating one if all are busy.
 
-    async def query(self, user_prompt: str) -> str:
+        Strands has no per-call parameter override, so a ``max_tokens`` cap
+        is applied by swapping in a cached model with that setting for the
+        duration of the loan.
+        """
+        tools = await self._get_tools()
+        agent = self._idle_agents.pop() if self._idle_agents else self._create_agent()
+        agent.messages = []
+        if max_tokens is not None:
+            agent.model = _get_model(self._api_key, _MODEL_ID, max_tokens, _TEMPERATURE)
+        try:
+            yield agent
+        finally:
+            agent.model = self.model
+            # Agents lent out across a tool refresh are stale; let them go
+            if tools is self._tools_cache:
+                self._idle_agents.append(agent)
+
+    async def query(self, user_prompt: str, max_tokens: Optional[int] = None) -> str:
         """Process a natural language query about Vault PKI and return response.
 
+        The response is collected from :meth:`query_stream`, so both methods
+        share one code path.
+
         Args:
             user_prompt: Natural language query from user
+            max_tokens: Cap on generated tokens for this query. Uses the
+                agent's default when not provided.
 
         Returns:
             str: Response from the agent with PKI information
         """
-        try:
-            # Get MCP tools for the agent
-            with self.mcp_client:
-                tools = self.mcp_client.list_tools_sync()
-
-                # Create agent with tools
-                agent = Agent(
-                    model=self.model,
-                    tools=tools,
-                    system_prompt=self.system_prompt,
-                )
-
-                # Invoke agent with user query
-                result: AgentResult = await agent.invoke_async(user_prompt)
-
-                if result.message and result.message.get("content"):
-                    # Extract response text
-                    response_text = ""
-                    for msg in result.message["content"]:
-                        if msg.get("text"):
-                            response_text += msg["text"].strip() + " "
-
-                    return (
-                        response_text.strip()
-                        if response_text.strip()
-                        else "I apologize, but I encountered an issue processing your request. Please try again or contact support."
-                    )
-                else:
-                    return "I apologize, but I encountered an issue processing your request. Please try again or contact support."
+        parts: List[str] = []
+        async for event in self.query_stream(user_prompt, max_tokens=max_tokens):
+            kind = event["_kind"]
+            if kind is EventKind.DATA:
+                parts.append(event["data"])
+            elif kind is EventKind.ERROR:
+                return event["message"]
 
-        except Exception as e:
-            return f"Error processing query: {str(e)}. Please check your connection to the MCP server and try again."
+        return "".join(parts).strip() or _FALLBACK_RESPONSE
+
+    def query_sync(self, user_prompt: str, max_tokens: Optional[int] = None) -> str:
+        """Blocking variant of :meth:`query` for callers without an event loop.
 
-    async def query_stream(self, user_prompt: str) -> AsyncIterator[Dict[str, Any]]:
+        The query runs on the shared background loop rather than a fresh
+        ``asyncio.run`` loop per call. Must not be called from that loop.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.query(user_prompt, max_tokens=max_tokens), get_background_loop()
+        ).result()
+
+    async def query_stream(
+        self,
+        user_prompt: str,
+        batch_ms: int = 25,
+        max_batch: int = 16,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
         """Process a natural language query about Vault PKI and return streaming response.
 
         This method uses agent.stream_async to provide real-time streaming of the agent's
         response, allowing for responsive user interfaces and real-time monitoring.
 
+        Consecutive text chunks are coalesced into one ``"data"`` event. A
+        batch is flushed once it holds the current size limit or ``batch_ms``
+        has passed since the last flush, and before any other event. The
+        first chunk is flushed on its own for a fast first token; the limit
+        then grows towards ``max_batch``.
+
+        A reply cut off by its ``max_tokens`` cap ends with a final text
+        event noting the truncation rather than an error event.
+
         Args:
             user_prompt: Natural language query from user
+            batch_ms: Longest time in milliseconds to hold back text chunks
+            max_batch: Most text chunks coalesced into one event
+            max_tokens: Cap on generated tokens for this query. Uses the
+                agent's default when not provided.
 
         Yields:
             Dict[str, Any]: Streaming events from the agent execution including:
@@ -137,6 +368,8 @@ For PKI engine queries, use list_certificates on the specific engine.
                 - "current_tool_use": Information about tools being used
                 - "result": Final AgentResult when complete
                 - Other lifecycle and processing events
+            Every event also carries its ``EventKind`` under ``"_kind"`` so
+            consumers can dispatch without probing for each key.
 
         Example:
             async for event in agent.query_stream("List all PKI secrets engines"):
@@ -149,36 +382,66 @@ For PKI engine queries, use list_certificates on the specific engine.
                 elif "result" in event:
                     print(f"\n✅ Query completed")
         """
+        batch_window = batch_ms / 1000
+        batch_limit = 1
+        buf: List[str] = []
+        last_flush = time.monotonic()
         try:
-            # Get MCP tools for the agent
-            with self.mcp_client:
-                tools = self.mcp_client.list_tools_sync()
-
-                # Create agent with tools
-                agent = Agent(
-                    model=self.model,
-                    tools=tools,
-                    system_prompt=self.system_prompt,
-                )
-
-                # Stream agent response
-                async for event in agent.stream_async(user_prompt):
-                    yield event
+            async with self._borrow_agent(max_tokens) as agent:
+                # Close the agent's stream before the agent goes back to the
+                # pool, including when the consumer stops iterating early
+                stream = agent.stream_async(user_prompt)
+                try:
+                    async for event in stream:
+                        kind = classify_event(event)
+                        if kind is EventKind.DATA:
+                            buf.append(event["data"])
+                            now = time.monotonic()
+                            if (
+                                len(buf) >= batch_limit
+                                or now - last_flush >= batch_window
+                            ):
+                                batch, buf = buf, []
+                                last_flush = now
+                                batch_limit = min(
+                                    batch_limit * _BATCH_SIZE_GROWTH_FACTOR, max_batch
+                                )
+                                yield _data_event(batch)
+                            continue
+
+                        if buf:
+                            batch, buf = buf, []
+                            last_flush = time.monotonic()
+                            yield _data_event(batch)
+                        if kind is EventKind.RESULT:
+                            _log_usage(event["result"])
+                        event["_kind"] = kind
+                        yield event
+                finally:
+                    await stream.aclose()
+
+            if buf:
+                yield _data_event(buf)
+
+        except MaxTokensReachedException:
+            # Strands raises rather than returning the cut-off reply; keep
+            # the text already generated and say that it is incomplete
+            buf.append(_TRUNCATION_NOTICE)
+            yield _data_event(buf)
 
         except Exception as e:
+            if buf:
+                yield _data_event(buf)
             # Yield error event in the same format
             yield {
                 "error": True,
                 "message": f"Error processing query: {str(e)}. Please check your connection to the MCP server and try again.",
+                "_kind": EventKind.ERROR,
             }
 
 
 if __name__ == "__main__":
     # Test both regular and streaming query methods
-    import asyncio
-
-    load_dotenv()
-
     async def test_regular_query():
         """Test the regular query method."""
         user_prompt = "List all PKI secrets engines in Vault."
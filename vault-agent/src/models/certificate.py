@@ -1,14 +1,17 @@
 """Certificate-specific data models and utilities."""
 
-from datetime import datetime
-from typing import List, Optional
+import bisect
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class CertificateDetails(BaseModel):
     """Detailed certificate information from Vault API."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     serial_number: str = Field(..., description="Certificate serial number")
     certificate_pem: str = Field(..., description="PEM-encoded certificate")
     issuing_ca: Optional[str] = Field(None, description="Issuing CA certificate")
@@ -20,6 +23,8 @@ class CertificateDetails(BaseModel):
 class CertificateFilter(BaseModel):
     """Criteria for filtering certificates."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     pki_engine: Optional[str] = Field(
         None, description="PKI engine mount path to filter by"
     )
@@ -42,19 +47,35 @@ def calculate_days_until_expiry(expiration_date: datetime) -> int:
     Returns:
         int: Days until expiration (negative if expired)
     """
-    now = datetime.now()
-    # Handle timezone-aware vs naive datetime
-    if expiration_date.tzinfo is not None and now.tzinfo is None:
-        from datetime import timezone
+    # Vault timestamps are UTC, so naive datetimes are treated as UTC
+    if expiration_date.tzinfo is None:
+        expiration_date = expiration_date.replace(tzinfo=timezone.utc)
 
-        now = now.replace(tzinfo=timezone.utc)
-    elif expiration_date.tzinfo is None and now.tzinfo is not None:
-        now = now.replace(tzinfo=None)
-
-    delta = expiration_date - now
+    delta = expiration_date - datetime.now(timezone.utc)
     return delta.days
 
 
+def _format_years(days_until_expiry: int) -> str:
+    years = days_until_expiry // 365
+    remaining_days = days_until_expiry % 365
+    if remaining_days < 30:
+        return f"Expires in {years} years"
+    months = remaining_days // 30
+    return f"Expires in {years} years, {months} months"
+
+
+# Lower bounds (in days) of each non-negative expiry range, and the formatter
+# used for it; days below the first bound format as "Expires today"
+_EXPIRY_BOUNDARIES = (1, 2, 31, 366)
+_EXPIRY_FORMATTERS: Tuple[Callable[[int], str], ...] = (
+    lambda days: "Expires today",
+    lambda days: "Expires tomorrow",
+    lambda days: f"Expires in {days} days",
+    lambda days: f"Expires in {days // 7} weeks",
+    _format_years,
+)
+
+
 def format_expiry_display(days_until_expiry: int) -> str:
     """Format expiry information for user display.
 
@@ -66,20 +87,5 @@ def format_expiry_display(days_until_expiry: int) -> str:
     """
     if days_until_expiry < 0:
         return f"Expired {abs(days_until_expiry)} days ago"
-    elif days_until_expiry == 0:
-        return "Expires today"
-    elif days_until_expiry == 1:
-        return "Expires tomorrow"
-    elif days_until_expiry <= 30:
-        return f"Expires in {days_until_expiry} days"
-    elif days_until_expiry <= 365:
-        weeks = days_until_expiry // 7
-        return f"Expires in {weeks} weeks"
-    else:
-        years = days_until_expiry // 365
-        remaining_days = days_until_expiry % 365
-        if remaining_days < 30:
-            return f"Expires in {years} years"
-        else:
-            months = remaining_days // 30
-            return f"Expires in {years} years, {months} months"
+    index = bisect.bisect_right(_EXPIRY_BOUNDARIES, days_until_expiry)
+    return _EXPIRY_FORMATTERS[index](days_until_expiry)
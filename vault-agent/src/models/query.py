@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 from typing import List, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class AuditEventType(str, Enum):
@@ -18,6 +18,8 @@ class AuditEventType(str, Enum):
 class CertificateSummary(BaseModel):
     """Simplified certificate data optimized for UI display."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     serial_number: str = Field(
         ..., description="Certificate serial number in hex format"
     )
@@ -48,10 +50,17 @@ class CertificateSummary(BaseModel):
         else:
             return "Active"
 
+    @property
+    def issuer_chain_str(self) -> str:
+        """Issuer chain joined for table display."""
+        return " → ".join(self.issuer_hierarchy) if self.issuer_hierarchy else "N/A"
+
 
 class PKIEngineInfo(BaseModel):
     """Information about PKI secrets engines."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     path: str = Field(..., description="Mount path identifier")
     type: str = Field(..., description="Always 'pki' for PKI engines")
     description: str = Field(..., description="Human-readable description")
@@ -59,8 +68,9 @@ class PKIEngineInfo(BaseModel):
         None, description="Number of certificates in engine"
     )
 
-    @validator("type")
-    def type_must_be_pki(cls, v):
+    @field_validator("type")
+    @classmethod
+    def type_must_be_pki(cls, v: str) -> str:
         if v != "pki":
             raise ValueError("PKI engine type must be 'pki'")
         return v
@@ -69,6 +79,8 @@ class PKIEngineInfo(BaseModel):
 class AuditEvent(BaseModel):
     """Certificate lifecycle audit information."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     timestamp: datetime = Field(..., description="When event occurred")
     event_type: AuditEventType = Field(..., description="Type of operation")
     certificate_subject: str = Field(..., description="Subject of affected certificate")
@@ -86,6 +98,8 @@ class AuditEvent(BaseModel):
 class QueryMetadata(BaseModel):
     """Query execution statistics."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     execution_time_ms: Optional[int] = Field(
         None, description="Query execution time in milliseconds"
     )
@@ -98,6 +112,8 @@ class QueryMetadata(BaseModel):
 class QueryResult(BaseModel):
     """Structured response containing query results and metadata."""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     success: bool = Field(..., description="Whether query completed successfully")
     message: str = Field(..., description="Human-readable result summary")
     certificates: List[CertificateSummary] = Field(
@@ -116,17 +132,3 @@ class QueryResult(BaseModel):
         default_factory=list, description="Non-fatal warnings or errors"
     )
 
-    @validator("certificates", "audit_events", "pki_engines")
-    def at_least_one_result_for_success(cls, v, values):
-        """Ensure successful queries have at least one result."""
-        if values.get("success", False):
-            # Check if this is the last field being validated and no results exist
-            other_results = [
-                values.get("certificates", []),
-                values.get("audit_events", []),
-                values.get("pki_engines", []),
-            ]
-            if not any(other_results) and not v:
-                # This is acceptable if there's a message explaining no results
-                pass
-        return v
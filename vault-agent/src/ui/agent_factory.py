@@ -0,0 +1,16 @@
+"""Shared VaultPKIAgent instance for the Streamlit UI."""
+
+import streamlit as st
+
+from ..agent.vault_pki_agent import VaultPKIAgent
+
+
+@st.cache_resource
+def get_agent() -> VaultPKIAgent:
+    """Create the process-wide agent shared by all Streamlit sessions.
+
+    Streamlit re-executes the app script on every interaction; caching the
+    agent as a resource keeps its model, MCP session and tool list alive
+    across reruns so only the first query pays for setup.
+    """
+    return VaultPKIAgent()
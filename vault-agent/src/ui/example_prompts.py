@@ -1,15 +1,18 @@
 """Example prompts for the Vault PKI Query Agent UI."""
 
-from typing import List, Dict
+import functools
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 
+# Reply length caps for categories whose answers are short
+_CATEGORY_MAX_TOKENS = {"❓ Help": 150}
 
-def get_example_prompts() -> List[Dict[str, str]]:
-    """Get list of example prompts organized by category.
-
-    Returns:
-        List of dictionaries with category, prompt, and description
-    """
-    return [
+# Example prompts, built once at import. Each entry is a read-only mapping
+# so the shared tuple can be handed to every caller safely.
+_EXAMPLE_PROMPTS: Tuple[Mapping[str, str], ...] = tuple(
+    MappingProxyType(prompt)
+    for prompt in (
         {
             "category": "🔥 Certificate Expiration",
             "prompt": "Show me all certificates expiring in next 30 days",
@@ -70,22 +73,45 @@ def get_example_prompts() -> List[Dict[str, str]]:
             "prompt": "Show me examples",
             "description": "Displays example queries you can try",
         },
-    ]
+    )
+)
+
+
+def get_example_prompts() -> Tuple[Mapping[str, str], ...]:
+    """Get example prompts organized by category.
+
+    Returns:
+        Tuple of read-only mappings with category, prompt, and description
+    """
+    return _EXAMPLE_PROMPTS
 
 
-def get_prompts_by_category() -> Dict[str, List[Dict[str, str]]]:
+@functools.lru_cache(maxsize=1)
+def get_prompts_by_category() -> Dict[str, List[Mapping[str, str]]]:
     """Get example prompts grouped by category.
 
+    The grouping is built once and shared between callers, so it must not be
+    modified.
+
     Returns:
         Dictionary with categories as keys and lists of prompts as values
     """
     prompts = get_example_prompts()
-    by_category = {}
+    by_category: Dict[str, List[Mapping[str, str]]] = defaultdict(list)
 
     for prompt in prompts:
-        category = prompt["category"]
-        if category not in by_category:
-            by_category[category] = []
-        by_category[category].append(prompt)
+        by_category[prompt["category"]].append(prompt)
+
+    return dict(by_category)
+
 
-    return by_category
+def get_prompt_max_tokens(prompt: str) -> Optional[int]:
+    """Get the max_tokens cap for an example prompt.
+
+    Returns:
+        The cap for the prompt's category, or None to use the agent default
+    """
+    for example in get_example_prompts():
+        if example["prompt"] == prompt:
+            return _CATEGORY_MAX_TOKENS.get(example["category"])
+    return None
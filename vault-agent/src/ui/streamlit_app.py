@@ -1,11 +1,62 @@
 """Streamlit web interface for the Vault PKI Query Agent."""
 
+import functools
+import html
+import textwrap
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
 import streamlit as st
-from datetime import datetime
-from typing import List, Optional
 
 from ..models.query import QueryResult, CertificateSummary, AuditEvent
-from .example_prompts import get_prompts_by_category
+from .agent_factory import get_agent
+
+
+# Number of queries kept in the session history
+MAX_QUERY_HISTORY = 50
+
+
+@functools.lru_cache(maxsize=1)
+def _keyed_prompts_by_category() -> Dict[
+    str, Tuple[str, Tuple[str, ...], Dict[str, str]]
+]:
+    """Get example prompt texts by category, with the widget key for each category.
+
+    Each category also maps its prompt texts to their descriptions. Keys come
+    from the category's position, so they are computed once and stay the same
+    across reruns and server restarts.
+    """
+    # Imported here since only the sidebar needs the prompt catalogue
+    from .example_prompts import get_prompts_by_category
+
+    return {
+        category: (
+            f"example_prompts_{index}",
+            tuple(prompt["prompt"] for prompt in prompts),
+            {prompt["prompt"]: prompt["description"] for prompt in prompts},
+        )
+        for index, (category, prompts) in enumerate(get_prompts_by_category().items())
+    }
+
+
+# Only the weights the theme uses; no italics
+_FONTS_URL = (
+    "https://fonts.googleapis.com/css2"
+    "?family=Noto+Sans:wght@300;400;500;600;700&family=Noto+Sans+Mono&display=swap"
+)
+
+# The theme is served from static/ (see .streamlit/config.toml) so the browser
+# caches it instead of receiving it inline on every rerun. Fonts are linked
+# rather than @import-ed from the theme so they load in parallel with it.
+_THEME_HEAD_HTML = f"""
+<link rel="preconnect" href="https://fonts.googleapis.com">
+<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+<link rel="preload" as="style" href="{_FONTS_URL}">
+<link rel="stylesheet" href="{_FONTS_URL}">
+<link rel="stylesheet" href="app/static/theme.css">
+"""
 
 
 def setup_page_config():
@@ -18,507 +69,10 @@ def setup_page_config():
     )
 
     # Apply Vault-inspired theme with modern fonts and white backgrounds
-    st.markdown(
-        """
-    <style>
-    /* Import Noto Sans fonts with preload for better performance */
-    @import url('https://fonts.googleapis.com/css2?family=Noto+Sans:ital,wght@0,100..900;1,100..900&family=Noto+Sans+Mono:wght@100..900&display=swap');
-    
-    /* Force font loading and apply globally with highest priority */
-    * {
-        font-family: 'Noto Sans', -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif !important;
-    }
-    
-    /* Specific targeting for all text elements */
-    body, html, div, span, p, h1, h2, h3, h4, h5, h6, 
-    .stApp, .main, [data-testid="stAppViewContainer"],
-    [data-testid="block-container"], .css-1d391kg,
-    .css-18e3th9, .css-1dp5vir, .css-k1vhr4 {
-        font-family: 'Noto Sans', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif !important;
-    }
-    
-    /* Code elements with Noto Sans Mono */
-    code, pre, kbd, samp, tt, .stCode, [class*="code"],
-    .css-1cpxqw2, .css-1x8cf1d {
-        font-family: 'Noto Sans Mono', 'SF Mono', 'Monaco', 'Inconsolata', monospace !important;
-    }
-    
-    /* Root variables for consistent theming */
-    :root {
-        --vault-primary: #1563ff;
-        --vault-primary-dark: #0d47cc;
-        --vault-secondary: #2563eb;
-        --vault-bg: #ffffff;
-        --vault-sidebar-bg: #f8fafc;
-        --vault-content-bg: #ffffff;
-        --vault-border: #e2e8f0;
-        --vault-border-dark: #cbd5e0;
-        --vault-text-primary: #1a202c;
-        --vault-text-secondary: #4a5568;
-        --vault-text-muted: #718096;
-        --vault-success: #38a169;
-        --vault-warning: #d69e2e;
-        --vault-error: #e53e3e;
-        --vault-info: #3182ce;
-    }
-    
-    /* Modern font configuration - using Noto Sans with maximum specificity */
-    html, body, [class*="css"], .stApp, .main,
-    div, span, p, h1, h2, h3, h4, h5, h6, label, input, button, select, textarea,
-    [data-testid="stAppViewContainer"], [data-testid="block-container"],
-    [data-testid="stSidebar"], .css-1d391kg, .css-18e3th9 {
-        font-family: 'Noto Sans', -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif !important;
-    }
-    
-    /* Code font - using Noto Sans Mono with maximum specificity */
-    code, pre, .stCode, [class*="code"], kbd, samp, tt,
-    .css-1cpxqw2, .css-1x8cf1d, [data-testid="stCodeBlock"] {
-        font-family: 'Noto Sans Mono', 'SF Mono', 'Monaco', 'Inconsolata', 'Roboto Mono', monospace !important;
-    }
-    
-    /* Main app background */
-    .stApp {
-        background-color: var(--vault-bg) !important;
-        color: var(--vault-text-primary) !important;
-        font-family: 'Noto Sans', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif !important;
-    }
-    
-    /* Sidebar styling - white background */
-    .stSidebar {
-        background-color: var(--vault-sidebar-bg) !important;
-        border-right: 1px solid var(--vault-border) !important;
-    }
-    
-    .stSidebar .stMarkdown,
-    .stSidebar .stMarkdown *,
-    .stSidebar h1,
-    .stSidebar h2,
-    .stSidebar h3,
-    .stSidebar h4,
-    .stSidebar h5,
-    .stSidebar h6,
-    .stSidebar p,
-    .stSidebar div,
-    .stSidebar span {
-        color: var(--vault-text-primary) !important;
-        background-color: transparent !important;
-    }
-    
-    /* Arc browser specific fixes for sidebar text */
-    [data-testid="stSidebar"] *,
-    [data-testid="stSidebar"] div,
-    [data-testid="stSidebar"] p,
-    [data-testid="stSidebar"] span,
-    [data-testid="stSidebar"] h1,
-    [data-testid="stSidebar"] h2,
-    [data-testid="stSidebar"] h3 {
-        color: var(--vault-text-primary) !important;
-        background-color: transparent !important;
-    }
-    
-    /* Main content area - white background */
-    .main .block-container,
-    [data-testid="block-container"] {
-        background-color: var(--vault-content-bg) !important;
-        color: var(--vault-text-primary) !important;
-        padding: 2rem !important;
-        border-radius: 8px !important;
-        margin: 1rem !important;
-    }
-    
-    /* Main content text styling with modern fonts */
-    .main h1,
-    .main h2,
-    .main h3,
-    .main h4,
-    .main h5,
-    .main h6 {
-        color: var(--vault-text-primary) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 600 !important;
-        letter-spacing: -0.025em !important;
-    }
-    
-    .main h1 {
-        font-size: 2.5rem !important;
-        font-weight: 700 !important;
-        margin-bottom: 1rem !important;
-        background: linear-gradient(135deg, var(--vault-primary), var(--vault-secondary)) !important;
-        -webkit-background-clip: text !important;
-        -webkit-text-fill-color: transparent !important;
-        background-clip: text !important;
-        letter-spacing: -0.05em !important;
-    }
-    
-    .main p,
-    .main .stMarkdown,
-    .main .stText,
-    .main div {
-        color: var(--vault-text-secondary) !important;
-        line-height: 1.6 !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 400 !important;
-    }
-    
-    /* Input fields with modern styling */
-    .stTextInput > div > div > input {
-        background-color: var(--vault-content-bg) !important;
-        color: var(--vault-text-primary) !important;
-        border: 2px solid var(--vault-border) !important;
-        border-radius: 8px !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 400 !important;
-        padding: 0.75rem 1rem !important;
-        font-size: 1rem !important;
-    }
-    
-    .stTextInput > div > div > input:focus {
-        border-color: var(--vault-primary) !important;
-        box-shadow: 0 0 0 3px rgba(21, 99, 255, 0.1) !important;
-        outline: none !important;
-    }
-    
-    .stTextInput > label {
-        color: var(--vault-text-primary) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.875rem !important;
-        margin-bottom: 0.5rem !important;
-    }
-    
-    .stTextInput input::placeholder {
-        color: var(--vault-text-muted) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-    }
-    
-    /* Modern button styling */
-    .stButton > button {
-        background-color: var(--vault-primary) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 8px !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.875rem !important;
-        padding: 0.75rem 1.5rem !important;
-        transition: all 0.2s ease !important;
-        letter-spacing: 0.025em !important;
-    }
-    
-    .stButton > button:hover {
-        background-color: var(--vault-primary-dark) !important;
-        transform: translateY(-1px) !important;
-        box-shadow: 0 4px 12px rgba(21, 99, 255, 0.3) !important;
-    }
-    
-    /* Secondary buttons */
-    .stButton > button[kind="secondary"] {
-        background-color: transparent !important;
-        border: 2px solid var(--vault-border) !important;
-        color: var(--vault-text-secondary) !important;
-    }
-    
-    .stButton > button[kind="secondary"]:hover {
-        border-color: var(--vault-primary) !important;
-        color: var(--vault-primary) !important;
-        background-color: rgba(21, 99, 255, 0.05) !important;
-    }
-    
-    /* Sidebar buttons with light blue gradient background - maximum specificity */
-    [data-testid="stSidebar"] button[kind="secondary"],
-    [data-testid="stSidebar"] .stButton > button,
-    [data-testid="stSidebar"] button {
-        background: linear-gradient(135deg, #e0f2fe 0%, #dbeafe 100%) !important;
-        border: 1px solid #bfdbfe !important;
-        color: #1e293b !important;
-        width: 100% !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 500 !important;
-        transition: all 0.2s ease !important;
-        text-align: left !important;
-        padding: 0.75rem 1rem !important;
-        border-radius: 8px !important;
-    }
-    
-    [data-testid="stSidebar"] button[kind="secondary"]:hover,
-    [data-testid="stSidebar"] .stButton > button:hover,
-    [data-testid="stSidebar"] button:hover {
-        background: linear-gradient(135deg, #bfdbfe 0%, #93c5fd 100%) !important;
-        border-color: #60a5fa !important;
-        color: #0f172a !important;
-        transform: translateX(2px) !important;
-        box-shadow: 0 2px 8px rgba(59, 130, 246, 0.2) !important;
-    }
-    
-    /* Data frames and tables */
-    .stDataFrame {
-        background-color: var(--vault-content-bg) !important;
-        border: 1px solid var(--vault-border) !important;
-        border-radius: 8px !important;
-        font-family: 'Noto Sans', sans-serif !important;
-    }
-    
-    .stDataFrame table {
-        background-color: var(--vault-content-bg) !important;
-        color: var(--vault-text-primary) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-    }
-    
-    .stDataFrame th {
-        background-color: #f8fafc !important;
-        color: var(--vault-text-primary) !important;
-        font-weight: 600 !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        border-bottom: 2px solid var(--vault-border) !important;
-    }
-    
-    .stDataFrame td {
-        color: var(--vault-text-secondary) !important;
-        border-bottom: 1px solid var(--vault-border) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-    }
-    
-    /* Metrics with modern typography */
-    [data-testid="metric-container"] {
-        background-color: #f8fafc !important;
-        border: 1px solid var(--vault-border) !important;
-        border-radius: 8px !important;
-        padding: 1rem !important;
-    }
-    
-    [data-testid="metric-container"] > div {
-        color: var(--vault-text-primary) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-    }
-    
-    [data-testid="metric-container"] [data-testid="metric-value"] {
-        font-weight: 600 !important;
-        font-size: 1.5rem !important;
-    }
-    
-    /* Alert boxes */
-    .stAlert {
-        border-radius: 8px !important;
-        border: none !important;
-        margin: 1rem 0 !important;
-        font-family: 'Noto Sans', sans-serif !important;
-    }
-    
-    .stSuccess {
-        background-color: rgba(56, 161, 105, 0.1) !important;
-        color: var(--vault-success) !important;
-        border-left: 4px solid var(--vault-success) !important;
-    }
-    
-    .stError {
-        background-color: rgba(229, 62, 62, 0.1) !important;
-        color: var(--vault-error) !important;
-        border-left: 4px solid var(--vault-error) !important;
-    }
-    
-    .stWarning {
-        background-color: rgba(214, 158, 46, 0.1) !important;
-        color: var(--vault-warning) !important;
-        border-left: 4px solid var(--vault-warning) !important;
-    }
-    
-    .stInfo {
-        background-color: rgba(49, 130, 206, 0.1) !important;
-        color: var(--vault-info) !important;
-        border-left: 4px solid var(--vault-info) !important;
-    }
-    
-    /* Expanders */
-    .streamlit-expanderHeader {
-        background-color: #f8fafc !important;
-        color: var(--vault-text-primary) !important;
-        border: 1px solid var(--vault-border) !important;
-        border-radius: 8px !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 500 !important;
-        margin: 1rem 0 !important;
-        clear: both !important;
-    }
-    
-    .streamlit-expanderContent {
-        background-color: var(--vault-content-bg) !important;
-        border: 1px solid var(--vault-border) !important;
-        border-top: none !important;
-        border-radius: 0 0 8px 8px !important;
-        clear: both !important;
-        margin-bottom: 1rem !important;
-    }
-    
-    /* Fix text overlap issues */
-    .main .block-container > div {
-        clear: both !important;
-        margin-bottom: 1rem !important;
-        position: relative !important;
-        z-index: 1 !important;
-    }
-    
-    /* Ensure proper spacing between sections */
-    .stMarkdown {
-        margin-bottom: 1rem !important;
-        clear: both !important;
-        position: relative !important;
-        overflow: hidden !important;
-    }
-    
-    .stExpander {
-        margin: 1rem 0 !important;
-        clear: both !important;
-        position: relative !important;
-        z-index: 2 !important;
-    }
-    
-    /* Prevent text from floating or overlapping */
-    .main .element-container {
-        clear: both !important;
-        position: relative !important;
-        margin-bottom: 0.5rem !important;
-    }
-    
-    /* Ensure query history section is properly isolated */
-    .stExpander [data-testid="stExpanderDetails"] {
-        clear: both !important;
-        position: relative !important;
-        background-color: var(--vault-content-bg) !important;
-        padding: 1rem !important;
-        margin: 0 !important;
-        overflow: hidden !important;
-    }
-    
-    /* Dividers */
-    hr {
-        border-color: var(--vault-border) !important;
-        margin: 2rem 0 !important;
-    }
-    
-    /* Code blocks with Noto Sans Mono */
-    .stCode {
-        background-color: #f8fafc !important;
-        border: 1px solid var(--vault-border) !important;
-        border-radius: 6px !important;
-        font-family: 'Noto Sans Mono', monospace !important;
-    }
-    
-    code {
-        background-color: #f8fafc !important;
-        color: var(--vault-primary) !important;
-        padding: 0.25rem 0.5rem !important;
-        border-radius: 4px !important;
-        font-family: 'Noto Sans Mono', 'SF Mono', 'Monaco', monospace !important;
-        font-size: 0.875rem !important;
-        font-weight: 500 !important;
-    }
-    
-    /* Toggle switch styling */
-    .stCheckbox > label {
-        color: var(--vault-text-primary) !important;
-        font-family: 'Noto Sans', sans-serif !important;
-        font-weight: 400 !important;
-    }
-    
-    /* Custom status indicators */
-    .status-active { color: var(--vault-success) !important; }
-    .status-warning { color: var(--vault-warning) !important; }
-    .status-error { color: var(--vault-error) !important; }
-    .status-info { color: var(--vault-info) !important; }
-    
-    /* Modern scrollbars */
-    ::-webkit-scrollbar {
-        width: 6px;
-        height: 6px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: #f1f5f9;
-        border-radius: 3px;
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: var(--vault-border-dark);
-        border-radius: 3px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: var(--vault-primary);
-    }
-    
-    /* Hide Streamlit branding - but preserve sidebar toggle */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: visible !important;}
-    
-    /* Ensure sidebar toggle icon displays correctly */
-    button[kind="header"] {
-        visibility: visible !important;
-        display: flex !important;
-        align-items: center !important;
-        justify-content: center !important;
-    }
-    
-    [data-testid="collapsedControl"] {
-        visibility: visible !important;
-        display: flex !important;
-    }
-    
-    [data-testid="collapsedControl"] svg {
-        display: block !important;
-        visibility: visible !important;
-    }
-    
-    /* Hide text, show only icon */
-    button[kind="header"] span[data-testid="stHeaderActionElements"] {
-        font-size: 0 !important;
-    }
-    
-    button[kind="header"] svg {
-        display: block !important;
-        visibility: visible !important;
-        width: 1.5rem !important;
-        height: 1.5rem !important;
-    }
-    
-    /* Custom animation for loading states */
-    @keyframes pulse {
-        0% { opacity: 1; }
-        50% { opacity: 0.5; }
-        100% { opacity: 1; }
-    }
-    
-    .loading {
-        animation: pulse 1.5s ease-in-out infinite;
-    }
-    
-    /* Improved typography scale */
-    h1 { font-size: 2.5rem; line-height: 1.2; }
-    h2 { font-size: 2rem; line-height: 1.3; }
-    h3 { font-size: 1.5rem; line-height: 1.4; }
-    h4 { font-size: 1.25rem; line-height: 1.4; }
-    h5 { font-size: 1.125rem; line-height: 1.5; }
-    h6 { font-size: 1rem; line-height: 1.5; }
-    
-    /* Better spacing for readability */
-    p { margin-bottom: 1rem; }
-    
-    /* Focus states for accessibility */
-    *:focus {
-        outline: 2px solid var(--vault-primary) !important;
-        outline-offset: 2px !important;
-    }
-    </style>
-    """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(_THEME_HEAD_HTML, unsafe_allow_html=True)
 
 
-def render_header():
-    """Render the main page header."""
-    # Custom header with Vault styling
-    st.markdown(
-        """
+_HEADER_HTML = """
     <div style="
         padding: 2rem 0 1rem 0;
         border-bottom: 1px solid var(--vault-border);
@@ -556,218 +110,274 @@ def render_header():
             Ask questions about your certificates, audit events, and PKI infrastructure using plain English.
         </p>
     </div>
-    """,
-        unsafe_allow_html=True,
-    )
+    """
+
+
+def render_header():
+    """Render the main page header."""
+    # Custom header with Vault styling
+    st.markdown(_HEADER_HTML, unsafe_allow_html=True)
 
 
 def render_sidebar():
     """Render the sidebar with example prompts and help."""
     with st.sidebar:
-        # Vault-style sidebar header
-        st.markdown(
-            """
+        _render_sidebar_body()
+
+
+def _select_prompt(key: str):
+    """Load the example prompt picked in the pills ``key`` into the query input."""
+    prompt = st.session_state[key]
+    if prompt is None:
+        return
+    # Runs as a callback, before the input widget is created in the rerun
+    st.session_state.query_text = prompt
+    # Remembered so the prompt's description is shown under its category
+    st.session_state.picked_example_prompt = (key, prompt)
+    # Clear the pick so the pills act as buttons and a prompt can be reused
+    st.session_state[key] = None
+    st.session_state.example_prompt_selected = True
+
+
+def _html(*blocks: str) -> str:
+    """Join HTML snippets into one markdown body.
+
+    Each snippet is dedented so that, once joined, none of them is indented
+    enough to be read as a markdown code block.
+    """
+    return "\n".join(textwrap.dedent(block).strip() for block in blocks)
+
+
+# Static sidebar markup
+_SIDEBAR_HEADER_HTML = """
+    <div style="
+        text-align: center;
+        padding: 1rem 0;
+        border-bottom: 1px solid var(--vault-border);
+        margin-bottom: 1.5rem;
+    ">
+        <h2 style="
+            font-size: 1.25rem !important;
+            margin: 0 !important;
+            color: var(--vault-text-primary) !important;
+            font-weight: 600 !important;
+        ">📚 Example Queries</h2>
+    </div>
+    """
+
+_SECTION_DIVIDER_HTML = (
+    '<div style="margin: 2rem 0;"><hr style="border: 1px solid var(--vault-border);"></div>'
+)
+
+_SYSTEM_INFO_HEADER_HTML = """
+    <div style="
+        padding: 1rem 0 0.5rem 0;
+    ">
+        <h2 style="
+            font-size: 1.25rem !important;
+            margin: 0 0 1rem 0 !important;
+            color: var(--vault-text-primary) !important;
+            font-weight: 600 !important;
+        ">ℹ️ System Info</h2>
+    </div>
+    """
+
+_MCP_SERVER_CARD_HTML = """
+    <div style="
+        background-color: var(--vault-content-bg);
+        padding: 0.75rem;
+        border-radius: 6px;
+        border: 1px solid var(--vault-border);
+        margin-bottom: 1rem;
+    ">
         <div style="
-            text-align: center;
-            padding: 1rem 0;
-            border-bottom: 1px solid var(--vault-border);
-            margin-bottom: 1.5rem;
-        ">
-            <h2 style="
-                font-size: 1.25rem !important;
-                margin: 0 !important;
-                color: var(--vault-text-primary) !important;
-                font-weight: 600 !important;
-            ">📚 Example Queries</h2>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
+            font-size: 0.85rem;
+            color: var(--vault-text-muted);
+            margin-bottom: 0.25rem;
+        ">MCP Server</div>
+        <div style="
+            color: var(--vault-text-primary);
+            font-family: 'JetBrains Mono', monospace;
+            font-size: 0.8rem;
+        ">{mcp_url}</div>
+    </div>
+    """
 
-        prompts_by_category = get_prompts_by_category()
 
-        for category, prompts in prompts_by_category.items():
-            # Category header with better styling
-            st.markdown(
-                f"""
-            <div style="
-                margin: 1rem 0 0.5rem 0;
-                padding: 0.5rem 0;
-                border-bottom: 1px solid var(--vault-border);
-            ">
-                <h3 style="
-                    font-size: 1rem !important;
-                    margin: 0 !important;
-                    color: var(--vault-primary) !important;
-                    font-weight: 500 !important;
-                ">{category}</h3>
-            </div>
-            """,
-                unsafe_allow_html=True,
-            )
+@functools.lru_cache(maxsize=8)
+def _system_info_html(mcp_url: str) -> str:
+    """Build the System Info section for an MCP server URL, escaping the URL."""
+    return _html(
+        _SECTION_DIVIDER_HTML,
+        _SYSTEM_INFO_HEADER_HTML,
+        _MCP_SERVER_CARD_HTML.format(mcp_url=html.escape(mcp_url)),
+    )
 
-            for prompt in prompts:
-                if st.button(
-                    prompt["prompt"],
-                    key=f"example_{hash(prompt['prompt'])}",
-                    help=prompt["description"],
-                    use_container_width=True,
-                ):
-                    st.session_state.selected_prompt = prompt["prompt"]
 
-        st.markdown(
-            '<div style="margin: 2rem 0;"><hr style="border: 1px solid var(--vault-border);"></div>',
-            unsafe_allow_html=True,
-        )
+_STREAMING_INFO_HEADER_HTML = """
+    <div style="
+        padding: 1rem 0 0.5rem 0;
+    ">
+        <h2 style="
+            font-size: 1.25rem !important;
+            margin: 0 0 1rem 0 !important;
+            color: var(--vault-text-primary) !important;
+            font-weight: 600 !important;
+        ">🔄 Streaming Info</h2>
+    </div>
+    """
 
-        # System Info section
-        st.markdown(
-            """
+_STREAMING_ENABLED_HTML = """
         <div style="
-            padding: 1rem 0 0.5rem 0;
+            background-color: rgba(56, 161, 105, 0.1);
+            border: 1px solid var(--vault-success);
+            border-radius: 6px;
+            padding: 1rem;
+            margin-bottom: 1rem;
         ">
-            <h2 style="
-                font-size: 1.25rem !important;
-                margin: 0 0 1rem 0 !important;
-                color: var(--vault-text-primary) !important;
-                font-weight: 600 !important;
-            ">ℹ️ System Info</h2>
+            <div style="
+                color: var(--vault-success);
+                font-weight: 600;
+                margin-bottom: 0.5rem;
+            ">Real-time streaming: Enabled</div>
+            <div style="
+                color: var(--vault-text-secondary);
+                font-size: 0.85rem;
+                line-height: 1.4;
+            ">
+                <strong>Benefits:</strong><br>
+                • See responses as they generate<br>
+                • Monitor tool usage in real-time<br>
+                • Better user experience<br>
+                • Early error detection
+            </div>
         </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        """
 
-        # Display connection status with better styling
-        mcp_url = st.session_state.get("mcp_server_url", "Not configured")
-        st.markdown(
-            f"""
+_REGULAR_MODE_HTML = """
         <div style="
-            background-color: var(--vault-content-bg);
-            padding: 0.75rem;
+            background-color: rgba(49, 130, 206, 0.1);
+            border: 1px solid var(--vault-info);
             border-radius: 6px;
-            border: 1px solid var(--vault-border);
+            padding: 1rem;
             margin-bottom: 1rem;
         ">
             <div style="
-                font-size: 0.85rem;
-                color: var(--vault-text-muted);
-                margin-bottom: 0.25rem;
-            ">MCP Server</div>
+                color: var(--vault-info);
+                font-weight: 600;
+                margin-bottom: 0.5rem;
+            ">Regular mode: Enabled</div>
             <div style="
-                color: var(--vault-text-primary);
-                font-family: 'JetBrains Mono', monospace;
-                font-size: 0.8rem;
-            ">{mcp_url}</div>
+                color: var(--vault-text-secondary);
+                font-size: 0.85rem;
+                line-height: 1.4;
+            ">
+                <strong>Mode:</strong><br>
+                • Complete response at once<br>
+                • Traditional query processing<br>
+                • No real-time feedback
+            </div>
         </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        """
 
-        # Health check button
-        if st.button("🔄 Check Health", use_container_width=True):
-            st.session_state.health_check_requested = True
+# Full Streaming Info section for each mode, keyed by streaming_enabled
+_STREAMING_CARD = {
+    mode: _html(_SECTION_DIVIDER_HTML, _STREAMING_INFO_HEADER_HTML, card)
+    for mode, card in ((True, _STREAMING_ENABLED_HTML), (False, _REGULAR_MODE_HTML))
+}
 
-        st.markdown(
-            '<div style="margin: 2rem 0;"><hr style="border: 1px solid var(--vault-border);"></div>',
-            unsafe_allow_html=True,
-        )
+_PERFORMANCE_TIPS_HTML = """
+        <div style="
+            color: var(--vault-text-secondary);
+            font-size: 0.85rem;
+            line-height: 1.5;
+        ">
+        • Use <strong>streaming mode</strong> for complex queries<br>
+        • Streaming shows tool usage in real-time<br>
+        • Regular mode for simple, quick queries<br>
+        • Watch the status indicators during processing
+        </div>
+        """
+
+
+@st.fragment
+def _render_sidebar_body():
+    """Render the sidebar contents as a fragment.
+
+    Interactions inside the sidebar rerun only this function; buttons whose
+    effect shows in the main area request a full app rerun explicitly.
+    Expects ``mcp_server_url`` and ``streaming_enabled`` in session state.
+    """
+    # A picked example prompt shows in the query input outside this fragment
+    if st.session_state.pop("example_prompt_selected", False):
+        st.rerun(scope="app")
+
+    # Vault-style sidebar header
+    st.markdown(_SIDEBAR_HEADER_HTML, unsafe_allow_html=True)
+
+    prompts_by_category = _keyed_prompts_by_category()
+    picked_key, picked_prompt = st.session_state.get(
+        "picked_example_prompt", (None, None)
+    )
 
-        # Streaming Info section
+    for category, (key, prompts, descriptions) in prompts_by_category.items():
+        # Category header with better styling
         st.markdown(
-            """
+            f"""
         <div style="
-            padding: 1rem 0 0.5rem 0;
+            margin: 1rem 0 0.5rem 0;
+            padding: 0.5rem 0;
+            border-bottom: 1px solid var(--vault-border);
         ">
-            <h2 style="
-                font-size: 1.25rem !important;
-                margin: 0 0 1rem 0 !important;
-                color: var(--vault-text-primary) !important;
-                font-weight: 600 !important;
-            ">🔄 Streaming Info</h2>
+            <h3 style="
+                font-size: 1rem !important;
+                margin: 0 !important;
+                color: var(--vault-primary) !important;
+                font-weight: 500 !important;
+            ">{category}</h3>
         </div>
         """,
             unsafe_allow_html=True,
         )
 
-        # Streaming mode info with cards
-        streaming_enabled = st.session_state.get("streaming_enabled", True)
-        if streaming_enabled:
-            st.markdown(
-                """
-            <div style="
-                background-color: rgba(56, 161, 105, 0.1);
-                border: 1px solid var(--vault-success);
-                border-radius: 6px;
-                padding: 1rem;
-                margin-bottom: 1rem;
-            ">
-                <div style="
-                    color: var(--vault-success);
-                    font-weight: 600;
-                    margin-bottom: 0.5rem;
-                ">Real-time streaming: Enabled</div>
-                <div style="
-                    color: var(--vault-text-secondary);
-                    font-size: 0.85rem;
-                    line-height: 1.4;
-                ">
-                    <strong>Benefits:</strong><br>
-                    • See responses as they generate<br>
-                    • Monitor tool usage in real-time<br>
-                    • Better user experience<br>
-                    • Early error detection
-                </div>
-            </div>
-            """,
-                unsafe_allow_html=True,
-            )
-        else:
-            st.markdown(
-                """
-            <div style="
-                background-color: rgba(49, 130, 206, 0.1);
-                border: 1px solid var(--vault-info);
-                border-radius: 6px;
-                padding: 1rem;
-                margin-bottom: 1rem;
-            ">
-                <div style="
-                    color: var(--vault-info);
-                    font-weight: 600;
-                    margin-bottom: 0.5rem;
-                ">Regular mode: Enabled</div>
-                <div style="
-                    color: var(--vault-text-secondary);
-                    font-size: 0.85rem;
-                    line-height: 1.4;
-                ">
-                    <strong>Mode:</strong><br>
-                    • Complete response at once<br>
-                    • Traditional query processing<br>
-                    • No real-time feedback
-                </div>
-            </div>
-            """,
-                unsafe_allow_html=True,
-            )
+        # One widget per category rather than one button per prompt
+        st.pills(
+            category,
+            prompts,
+            key=key,
+            on_change=_select_prompt,
+            args=(key,),
+            label_visibility="collapsed",
+        )
+        # Pills have no per-option tooltip; describe the last prompt picked
+        if key == picked_key:
+            st.caption(descriptions[picked_prompt])
 
-        # Show performance tips
-        with st.expander("💡 Performance Tips"):
-            st.markdown(
-                """
-            <div style="
-                color: var(--vault-text-secondary);
-                font-size: 0.85rem;
-                line-height: 1.5;
-            ">
-            • Use <strong>streaming mode</strong> for complex queries<br>
-            • Streaming shows tool usage in real-time<br>
-            • Regular mode for simple, quick queries<br>
-            • Watch the status indicators during processing
-            </div>
-            """,
-                unsafe_allow_html=True,
-            )
+    # System Info section
+    # Display connection status with better styling
+    st.markdown(
+        _system_info_html(st.session_state.mcp_server_url), unsafe_allow_html=True
+    )
+
+    # Health check button
+    if st.button("🔄 Check Health", width="stretch"):
+        st.session_state.health_check_requested = True
+        # The health check result is shown in the main area
+        st.rerun(scope="app")
+
+    # Streaming Info section with the card for the current mode
+    st.markdown(
+        _STREAMING_CARD[st.session_state.streaming_enabled], unsafe_allow_html=True
+    )
+
+    # Show performance tips
+    with st.expander("💡 Performance Tips"):
+        st.markdown(_PERFORMANCE_TIPS_HTML, unsafe_allow_html=True)
+
+
+def _clear_query_input():
+    """Empty the query input."""
+    st.session_state.query_text = ""
 
 
 def render_query_input() -> Optional[str]:
@@ -776,13 +386,6 @@ def render_query_input() -> Optional[str]:
     Returns:
         Query text if submitted, None otherwise
     """
-    # Check if an example prompt was selected
-    if "selected_prompt" in st.session_state:
-        prompt_text = st.session_state.selected_prompt
-        del st.session_state.selected_prompt
-    else:
-        prompt_text = ""
-
     # Query input section with improved styling
     st.markdown(
         """
@@ -809,7 +412,7 @@ def render_query_input() -> Optional[str]:
         # Query input
         query_text = st.text_input(
             "Enter your question about Vault PKI:",
-            value=prompt_text,
+            key="query_text",
             placeholder="e.g., Show me all certificates expiring in next 30 days",
             help="Type your question in natural language and press Enter or click Query to submit. In streaming mode, you'll see real-time responses and tool usage.",
             label_visibility="collapsed",
@@ -819,19 +422,18 @@ def render_query_input() -> Optional[str]:
 
         with col1:
             submit_clicked = st.form_submit_button(
-                "🔍 Query", type="primary", use_container_width=True
+                "🔍 Query", type="primary", width="stretch"
             )
 
         with col2:
-            clear_clicked = st.form_submit_button("🗑️ Clear", use_container_width=True)
+            clear_clicked = st.form_submit_button(
+                "🗑️ Clear", on_click=_clear_query_input, width="stretch"
+            )
 
         # Handle form submission - the form submits when ANY button is clicked or Enter is pressed
         # We need to check which button was clicked
         if clear_clicked:
-            # Clear the session state for selected prompt
-            if "selected_prompt" in st.session_state:
-                del st.session_state.selected_prompt
-            st.rerun()
+            # The input was already emptied by the callback before this run
             return None
 
         if submit_clicked and query_text.strip():
@@ -913,15 +515,13 @@ def render_certificates(certificates: List[CertificateSummary]):
                 "Serial Number": cert.serial_number,
                 "PKI Engine": cert.pki_engine,
                 "Days Until Expiry": cert.days_until_expiry,
-                "Issuer Chain": " → ".join(cert.issuer_hierarchy)
-                if cert.issuer_hierarchy
-                else "N/A",
+                "Issuer Chain": cert.issuer_chain_str,
             }
         )
 
     st.dataframe(
         data,
-        use_container_width=True,
+        width="stretch",
         hide_index=True,
         column_config={
             "Status": st.column_config.TextColumn("Status", width="small"),
@@ -986,7 +586,7 @@ def render_audit_events(audit_events: List[AuditEvent]):
 
     st.dataframe(
         data,
-        use_container_width=True,
+        width="stretch",
         hide_index=True,
         column_config={
             "Timestamp": st.column_config.DatetimeColumn("Timestamp", width="medium"),
@@ -1023,58 +623,45 @@ def render_audit_events(audit_events: List[AuditEvent]):
             st.divider()
 
 
+_HISTORY_SPACER_HTML = (
+    '<div style="margin-top: 2rem; clear: both; position: relative; z-index: 1;"></div>'
+)
+
+_HISTORY_ROW_HTML = (
+    '<div style="margin: 0.5rem 0; padding: 0.25rem 0; clear: both; '
+    "line-height: 1.4; font-family: 'Noto Sans', sans-serif;\">"
+    "{icon} {timestamp}: {query}</div>"
+)
+
+
 def render_query_history():
     """Render query history section."""
     if "query_history" not in st.session_state:
-        st.session_state.query_history = []
+        st.session_state.query_history = deque(maxlen=MAX_QUERY_HISTORY)
 
     if st.session_state.query_history:
         # Add proper spacing and isolation for query history
-        st.markdown(
-            """
-        <div style="
-            margin-top: 2rem;
-            clear: both;
-            position: relative;
-            z-index: 1;
-        "></div>
-        """,
-            unsafe_allow_html=True,
-        )
+        st.markdown(_HISTORY_SPACER_HTML, unsafe_allow_html=True)
 
         with st.expander("📜 Query History"):
+            # All entries go out as one element; queries are user text, so
+            # they are escaped before being embedded in the HTML
+            rows = "".join(
+                _HISTORY_ROW_HTML.format(
+                    icon="✅" if success else "❌",
+                    timestamp=timestamp,
+                    query=html.escape(query),
+                )
+                for timestamp, query, success in islice(
+                    reversed(st.session_state.query_history), 10
+                )
+            )
             st.markdown(
-                """
-            <div style="
-                padding: 0.5rem 0;
-                clear: both;
-                overflow: hidden;
-            ">
-            """,
+                '<div style="padding: 0.5rem 0; clear: both; overflow: hidden;">'
+                f"{rows}</div>",
                 unsafe_allow_html=True,
             )
 
-            for i, (timestamp, query, success) in enumerate(
-                reversed(st.session_state.query_history[-10:])
-            ):
-                status_icon = "✅" if success else "❌"
-                st.markdown(
-                    f"""
-                <div style="
-                    margin: 0.5rem 0;
-                    padding: 0.25rem 0;
-                    clear: both;
-                    line-height: 1.4;
-                    font-family: 'Noto Sans', sans-serif;
-                ">
-                    {status_icon} {timestamp}: {query}
-                </div>
-                """,
-                    unsafe_allow_html=True,
-                )
-
-            st.markdown("</div>", unsafe_allow_html=True)
-
 
 def add_to_query_history(query: str, success: bool):
     """Add a query to the session history.
@@ -1084,35 +671,33 @@ def add_to_query_history(query: str, success: bool):
         success: Whether the query was successful
     """
     if "query_history" not in st.session_state:
-        st.session_state.query_history = []
+        st.session_state.query_history = deque(maxlen=MAX_QUERY_HISTORY)
 
-    timestamp = datetime.now().strftime("%H:%M:%S")
+    timestamp = time.strftime("%H:%M:%S")
+    # The deque drops the oldest entry once MAX_QUERY_HISTORY is reached
     st.session_state.query_history.append((timestamp, query, success))
 
-    # Keep only last 50 queries
-    if len(st.session_state.query_history) > 50:
-        st.session_state.query_history = st.session_state.query_history[-50:]
-
 
 def show_connection_status():
-    """Show MCP server connection status."""
-    if st.session_state.get("health_check_requested"):
-        st.session_state.health_check_requested = False
+    """Show MCP server connection status.
 
-        # This would be replaced with actual health check
-        st.info(
-            "Health check functionality will be implemented with actual MCP client."
-        )
+    Callers invoke this only when ``health_check_requested`` is set.
+    """
+    st.session_state.health_check_requested = False
+
+    # Reuse the cached agent's MCP session rather than opening a new one;
+    # listing tools is a live round-trip to the server
+    try:
+        tools = get_agent().mcp_client.list_tools_sync()
+    except Exception as e:
+        st.error(f"❌ MCP server health check failed: {str(e)}")
+    else:
+        st.success(f"✅ MCP server is reachable ({len(tools)} tools available)")
 
 
-def render_footer():
-    """Render page footer."""
-    st.markdown(
-        '<div style="margin: 3rem 0 1rem 0;"><hr style="border: 1px solid var(--vault-border);"></div>',
-        unsafe_allow_html=True,
-    )
-    st.markdown(
-        """
+_FOOTER_HTML = _html(
+    '<div style="margin: 3rem 0 1rem 0;"><hr style="border: 1px solid var(--vault-border);"></div>',
+    """
     <div style='
         text-align: center;
         color: var(--vault-text-muted);
@@ -1132,5 +717,9 @@ def render_footer():
         </div>
     </div>
     """,
-        unsafe_allow_html=True,
-    )
+)
+
+
+def render_footer():
+    """Render page footer."""
+    st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
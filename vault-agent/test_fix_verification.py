@@ -1,5 +1,9 @@
 """Test script to verify the main.py fix for the 'str' object has no attribute 'items' error."""
 
+# Tool input parameters shown next to the tool name, in display order.
+# Looked up directly, so the cost does not grow with the size of the input.
+_INTERESTING_KEYS = ("pki_mount_path", "vault_certificate_subject", "vault_pki_path")
+
 
 def test_tool_input_handling():
     """Test the different types of tool_input that might be received."""
@@ -43,13 +47,11 @@ def test_tool_input_handling():
             key_params = []
             # Fixed logic: Check if tool_input is a dictionary before calling .items()
             if isinstance(tool_input, dict):
-                for key, value in tool_input.items():
-                    if key in [
-                        "pki_mount_path",
-                        "vault_certificate_subject",
-                        "vault_pki_path",
-                    ]:
-                        key_params.append(f"{key}: {value}")
+                key_params.extend(
+                    f"{key}: {tool_input[key]}"
+                    for key in _INTERESTING_KEYS
+                    if key in tool_input
+                )
             elif isinstance(tool_input, str):
                 # If tool_input is a string, just show it directly
                 key_params.append(f"input: {tool_input}")
@@ -111,13 +113,11 @@ def test_event_structure():
                     if tool_input:
                         key_params = []
                         if isinstance(tool_input, dict):
-                            for key, value in tool_input.items():
-                                if key in [
-                                    "pki_mount_path",
-                                    "vault_certificate_subject",
-                                    "vault_pki_path",
-                                ]:
-                                    key_params.append(f"{key}: {value}")
+                            key_params.extend(
+                                f"{key}: {tool_input[key]}"
+                                for key in _INTERESTING_KEYS
+                                if key in tool_input
+                            )
                         elif isinstance(tool_input, str):
                             key_params.append(f"input: {tool_input}")
 
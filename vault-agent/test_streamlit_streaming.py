@@ -3,6 +3,7 @@
 import asyncio
 import sys
 import os
+from time import perf_counter
 
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
@@ -10,16 +11,12 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
 from agent.vault_pki_agent import VaultPKIAgent
 
 
-async def test_streaming():
+async def check_streaming(agent: VaultPKIAgent):
     """Test the streaming functionality of the agent."""
     print("Testing Vault PKI Agent Streaming Functionality")
     print("=" * 50)
 
     try:
-        # Initialize agent
-        agent = VaultPKIAgent()
-        print("✅ Agent initialized successfully")
-
         # Test query
         test_query = "List all PKI secrets engines in Vault"
         print(f"🔍 Testing query: {test_query}")
@@ -27,17 +24,19 @@ async def test_streaming():
 
         # Test streaming
         print("🔄 Streaming response:")
-        full_response = ""
+        response_parts = []
         tools_used = []
+        seen_tools = set()
 
         async for event in agent.query_stream(test_query):
             if "data" in event:
                 chunk = event["data"]
                 print(chunk, end="", flush=True)
-                full_response += chunk
+                response_parts.append(chunk)
             elif "current_tool_use" in event and event["current_tool_use"].get("name"):
                 tool_name = event["current_tool_use"]["name"]
-                if tool_name not in tools_used:
+                if tool_name not in seen_tools:
+                    seen_tools.add(tool_name)
                     tools_used.append(tool_name)
                     print(f"\n🔧 Using tool: {tool_name}")
             elif "result" in event:
@@ -47,6 +46,8 @@ async def test_streaming():
                 print(f"\n❌ Error: {event['message']}")
                 break
 
+        full_response = "".join(response_parts)
+
         print("\n\n📊 Summary:")
         print(f"  - Response length: {len(full_response)} characters")
         print(f"  - Tools used: {', '.join(tools_used) if tools_used else 'None'}")
@@ -58,22 +59,21 @@ async def test_streaming():
     return True
 
 
-async def compare_methods():
+async def compare_methods(agent: VaultPKIAgent):
     """Compare streaming vs regular method performance."""
     print("\n" + "=" * 50)
     print("Performance Comparison: Streaming vs Regular")
     print("=" * 50)
 
-    agent = VaultPKIAgent()
     test_query = "Show me all certificates expiring in the next 30 days"
 
     # Test regular method
     print("🔸 Testing regular method...")
-    start_time = asyncio.get_event_loop().time()
+    start_time = perf_counter()
 
     try:
         regular_response = await agent.query(test_query)
-        regular_time = asyncio.get_event_loop().time() - start_time
+        regular_time = perf_counter() - start_time
         print(f"⏱️ Regular method completed in: {regular_time:.2f} seconds")
         print(f"📏 Response length: {len(regular_response)} characters")
     except Exception as e:
@@ -82,21 +82,22 @@ async def compare_methods():
 
     # Test streaming method
     print("\n🔸 Testing streaming method...")
-    start_time = asyncio.get_event_loop().time()
+    start_time = perf_counter()
     first_chunk_time = None
 
     try:
-        streaming_response = ""
+        streaming_parts = []
 
         async for event in agent.query_stream(test_query):
             if "data" in event:
                 if first_chunk_time is None:
-                    first_chunk_time = asyncio.get_event_loop().time() - start_time
-                streaming_response += event["data"]
+                    first_chunk_time = perf_counter() - start_time
+                streaming_parts.append(event["data"])
             elif "result" in event:
                 break
 
-        total_time = asyncio.get_event_loop().time() - start_time
+        total_time = perf_counter() - start_time
+        streaming_response = "".join(streaming_parts)
         print(f"⏱️ Streaming method completed in: {total_time:.2f} seconds")
         print(f"⚡ First chunk received after: {first_chunk_time:.2f} seconds")
         print(f"📏 Response length: {len(streaming_response)} characters")
@@ -109,6 +110,28 @@ async def compare_methods():
         print(f"❌ Streaming method failed: {str(e)}")
 
 
+async def run_tests() -> bool:
+    """Run all tests against one agent on one event loop.
+
+    Like the Streamlit app, the agent and its MCP session are created once
+    and reused, so the comparison measures queries rather than agent setup.
+    """
+    try:
+        agent = VaultPKIAgent()
+        print("✅ Agent initialized successfully")
+    except Exception as e:
+        print(f"❌ Test failed: {str(e)}")
+        return False
+
+    # Test basic streaming
+    if not await check_streaming(agent):
+        return False
+
+    # Compare methods
+    await compare_methods(agent)
+    return True
+
+
 def main():
     """Main test function."""
     print("Vault PKI Agent - Streamlit Integration Test")
@@ -116,13 +139,9 @@ def main():
     print()
 
     try:
-        # Test basic streaming
-        success = asyncio.run(test_streaming())
+        success = asyncio.run(run_tests())
 
         if success:
-            # Compare methods
-            asyncio.run(compare_methods())
-
             print("\n" + "=" * 50)
             print("✅ All tests completed successfully!")
             print("🚀 Your Streamlit app is ready to use streaming!")
@@ -1,14 +1,41 @@
 """Tests for the agent functionality."""
 
+import asyncio
+
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
+from strands.types.exceptions import MaxTokensReachedException
+
+from src.agent.vault_pki_agent import (
+    EventKind,
+    VaultPKIAgent,
+    _get_model,
+    get_background_loop,
+)
+
+
+def fake_stream(*events):
+    """Build a stand-in for ``Agent.stream_async`` yielding ``events``.
+
+    An exception in ``events`` is raised at that point in the stream.
+    """
 
-from src.agent.vault_pki_agent import VaultPKIAgent
+    async def stream_async(prompt):
+        for event in events:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+    return Mock(side_effect=stream_async)
 
 
 class TestVaultPKIAgent:
     """Test cases for VaultPKIAgent."""
 
+    def setup_method(self):
+        """Drop models cached by earlier tests."""
+        _get_model.cache_clear()
+
     def test_agent_initialization_missing_api_key(self):
         """Test agent initialization fails without OpenAI API key."""
         with patch.dict("os.environ", {}, clear=True):
@@ -16,9 +43,12 @@ class TestVaultPKIAgent:
                 VaultPKIAgent()
 
     @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.Agent")
     @patch("src.agent.vault_pki_agent.OpenAIModel")
     @patch("src.agent.vault_pki_agent.MCPClient")
-    def test_agent_initialization_success(self, mock_mcp_client, mock_openai_model):
+    def test_agent_initialization_success(
+        self, mock_mcp_client, mock_openai_model, mock_agent_class
+    ):
         """Test successful agent initialization."""
         mock_model = Mock()
         mock_openai_model.return_value = mock_model
@@ -28,7 +58,76 @@ class TestVaultPKIAgent:
         assert agent.model == mock_model
         assert agent.system_prompt is not None
         assert "PKI expert" in agent.system_prompt
-        mock_openai_model.assert_called_once_with(api_key="test-key")
+        mock_openai_model.assert_called_once()
+        assert mock_openai_model.call_args.kwargs["client_args"] == {
+            "api_key": "test-key"
+        }
+
+        # A second agent with the same settings reuses the cached model
+        assert VaultPKIAgent().model is mock_model
+        mock_openai_model.assert_called_once()
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.atexit")
+    @patch("src.agent.vault_pki_agent.Agent")
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    def test_mcp_session_opened_once(
+        self, mock_mcp_client, mock_openai_model, mock_agent_class, mock_atexit
+    ):
+        """Test the MCP session and tool list are set up once and closed once."""
+        mock_mcp_instance = MagicMock()
+        mock_mcp_instance.list_tools_sync.return_value = []
+        mock_mcp_client.return_value = mock_mcp_instance
+
+        agent = VaultPKIAgent()
+        agent.close()
+        agent.close()
+
+        mock_mcp_instance.__enter__.assert_called_once()
+        mock_mcp_instance.list_tools_sync.assert_called_once()
+        mock_agent_class.assert_called_once()
+        mock_mcp_instance.__exit__.assert_called_once_with(None, None, None)
+        # The exit hook is registered once and dropped on close
+        mock_atexit.register.assert_called_once_with(agent.close)
+        mock_atexit.unregister.assert_called_once_with(agent.close)
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.Agent")
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    def test_mcp_session_closed_when_tool_listing_fails(
+        self, mock_mcp_client, mock_openai_model, mock_agent_class
+    ):
+        """Test a failure after the MCP session opens still closes it."""
+        mock_mcp_instance = MagicMock()
+        mock_mcp_instance.list_tools_sync.side_effect = ConnectionError("refused")
+        mock_mcp_client.return_value = mock_mcp_instance
+
+        with pytest.raises(ConnectionError, match="refused"):
+            VaultPKIAgent()
+
+        mock_mcp_instance.__exit__.assert_called_once_with(None, None, None)
+        mock_agent_class.assert_not_called()
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.Agent")
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    async def test_async_context_manager_closes_session(
+        self, mock_mcp_client, mock_openai_model, mock_agent_class
+    ):
+        """Test leaving ``async with`` closes the MCP session opened at init."""
+        mock_mcp_instance = MagicMock()
+        mock_mcp_client.return_value = mock_mcp_instance
+
+        async with VaultPKIAgent() as agent:
+            mock_mcp_instance.__enter__.assert_called_once()
+            mock_mcp_instance.__exit__.assert_not_called()
+
+        mock_mcp_instance.__exit__.assert_called_once_with(None, None, None)
+        agent.close()
+        mock_mcp_instance.__exit__.assert_called_once()
 
     @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
     @patch("src.agent.vault_pki_agent.OpenAIModel")
@@ -38,28 +137,87 @@ class TestVaultPKIAgent:
         self, mock_agent_class, mock_mcp_client, mock_openai_model
     ):
         """Test successful query processing."""
-        # Mock agent result
-        mock_agent_result = Mock()
-        mock_agent_result.message = {
-            "content": [{"text": "Found 3 certificates expiring in 30 days"}]
-        }
-
+        # Mock agent stream
         mock_agent_instance = Mock()
-        mock_agent_instance.invoke_async.return_value = mock_agent_result
+        mock_agent_instance.stream_async = fake_stream(
+            {"init_event_loop": True},
+            {"data": "Found 3 certificates "},
+            {"current_tool_use": {"name": "list_certificates"}},
+            {"data": "expiring in 30 days\n"},
+        )
         mock_agent_class.return_value = mock_agent_instance
 
         # Mock MCP client
-        mock_mcp_instance = Mock()
+        mock_mcp_instance = MagicMock()
         mock_mcp_instance.list_tools_sync.return_value = []
         mock_mcp_client.return_value = mock_mcp_instance
 
         agent = VaultPKIAgent()
         result = await agent.query("Show certificates expiring in 30 days")
+        await agent.query("Show certificates expiring in 30 days")
 
         assert result == "Found 3 certificates expiring in 30 days"
-        mock_agent_instance.invoke_async.assert_called_once_with(
+        assert mock_agent_instance.stream_async.call_count == 2
+        mock_agent_instance.stream_async.assert_called_with(
             "Show certificates expiring in 30 days"
         )
+        # Tools are discovered once, not per query
+        mock_mcp_instance.list_tools_sync.assert_called_once()
+        assert mock_agent_instance.messages == []
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_tools_relisted_after_ttl(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
+        """Test tools and agents are refreshed once the tool cache TTL expires."""
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = fake_stream({"data": "ok"})
+        mock_agent_class.return_value = mock_agent_instance
+
+        mock_mcp_instance = MagicMock()
+        mock_mcp_instance.list_tools_sync.side_effect = [["old"], ["new"]]
+        mock_mcp_client.return_value = mock_mcp_instance
+
+        agent = VaultPKIAgent()
+        await agent.query("Test query")
+        assert agent._tools_cache == ["old"]
+
+        agent._tools_cache_expiry = 0
+        await agent.query("Test query")
+
+        assert mock_mcp_instance.list_tools_sync.call_count == 2
+        assert agent._tools_cache == ["new"]
+        # The idle agent built with the old tools is rebuilt, then reused
+        assert mock_agent_class.call_count == 2
+        assert mock_agent_class.call_args.kwargs["tools"] == ["new"]
+        await agent.query("Test query")
+        assert mock_agent_class.call_count == 2
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    def test_query_sync(self, mock_agent_class, mock_mcp_client, mock_openai_model):
+        """Test query_sync runs queries on one shared background loop."""
+        loops = []
+
+        async def stream_async(prompt):
+            loops.append(asyncio.get_running_loop())
+            yield {"data": prompt}
+
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = stream_async
+        mock_agent_class.return_value = mock_agent_instance
+        mock_mcp_client.return_value = MagicMock()
+
+        agent = VaultPKIAgent()
+
+        assert agent.query_sync("q1") == "q1"
+        assert agent.query_sync("q2") == "q2"
+        assert loops[0] is loops[1] is get_background_loop()
 
     @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
     @patch("src.agent.vault_pki_agent.OpenAIModel")
@@ -69,16 +227,13 @@ class TestVaultPKIAgent:
         self, mock_agent_class, mock_mcp_client, mock_openai_model
     ):
         """Test query with empty agent response."""
-        # Mock empty agent result
-        mock_agent_result = Mock()
-        mock_agent_result.message = {"content": []}
-
+        # Mock a stream with no text
         mock_agent_instance = Mock()
-        mock_agent_instance.invoke_async.return_value = mock_agent_result
+        mock_agent_instance.stream_async = fake_stream({"init_event_loop": True})
         mock_agent_class.return_value = mock_agent_instance
 
         # Mock MCP client
-        mock_mcp_instance = Mock()
+        mock_mcp_instance = MagicMock()
         mock_mcp_instance.list_tools_sync.return_value = []
         mock_mcp_client.return_value = mock_mcp_instance
 
@@ -90,15 +245,178 @@ class TestVaultPKIAgent:
     @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
     @patch("src.agent.vault_pki_agent.OpenAIModel")
     @patch("src.agent.vault_pki_agent.MCPClient")
-    async def test_query_exception_handling(self, mock_mcp_client, mock_openai_model):
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_query_exception_handling(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
         """Test query exception handling."""
-        # Mock MCP client to raise exception
-        mock_mcp_instance = Mock()
-        mock_mcp_instance.__enter__.side_effect = Exception("Connection failed")
-        mock_mcp_client.return_value = mock_mcp_instance
+        # Mock agent stream to raise exception
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = fake_stream(
+            {"data": "partial"}, Exception("Connection failed")
+        )
+        mock_agent_class.return_value = mock_agent_instance
+        mock_mcp_client.return_value = MagicMock()
 
         agent = VaultPKIAgent()
         result = await agent.query("Test query")
 
         assert "Error processing query" in result
         assert "Connection failed" in result
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_query_truncated_at_max_tokens(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
+        """Test a reply cut off by max_tokens keeps its text and notes the cut."""
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = fake_stream(
+            {"data": "| Serial | CN |\n"},
+            {"data": "| 01 | web.example.com |"},
+            MaxTokensReachedException("max_tokens limit"),
+        )
+        mock_agent_class.return_value = mock_agent_instance
+        mock_mcp_client.return_value = MagicMock()
+
+        agent = VaultPKIAgent()
+        events = [event async for event in agent.query_stream("Test query")]
+        result = await agent.query("Test query")
+
+        assert all(event["_kind"] is EventKind.DATA for event in events)
+        assert result.startswith("| Serial | CN |\n| 01 | web.example.com |")
+        assert "Response truncated" in result
+        assert "Error processing query" not in result
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_concurrent_queries_use_separate_agents(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
+        """Test overlapping queries never share an Agent and reuse idle ones."""
+        release = asyncio.Event()
+        busy = []
+
+        def make_agent(**kwargs):
+            instance = Mock()
+
+            async def stream_async(prompt):
+                busy.append(instance)
+                await release.wait()
+                yield {"data": prompt}
+
+            instance.stream_async = stream_async
+            return instance
+
+        mock_agent_class.side_effect = make_agent
+        mock_mcp_client.return_value = MagicMock()
+
+        agent = VaultPKIAgent()
+        tasks = [asyncio.create_task(agent.query(f"q{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*tasks) == ["q0", "q1"]
+        assert busy[0] is not busy[1]
+        assert mock_agent_class.call_count == 2
+
+        await agent.query("q2")
+        assert mock_agent_class.call_count == 2
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_query_stream_tags_event_kind(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
+        """Test streamed events carry their EventKind, including errors."""
+
+        async def stream_async(prompt):
+            yield {"init_event_loop": True}
+            yield {"data": "Found"}
+            yield {"current_tool_use": {"name": "list_certificates"}}
+            raise Exception("Connection failed")
+
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = stream_async
+        mock_agent_class.return_value = mock_agent_instance
+        mock_mcp_client.return_value = MagicMock()
+
+        agent = VaultPKIAgent()
+        events = [event async for event in agent.query_stream("Test query")]
+
+        assert [event["_kind"] for event in events] == [
+            EventKind.INIT_EVENT_LOOP,
+            EventKind.DATA,
+            EventKind.TOOL_USE,
+            EventKind.ERROR,
+        ]
+        assert "Connection failed" in events[-1]["message"]
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_query_stream_batches_text(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
+        """Test text chunks are coalesced in growing batches around other events."""
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = fake_stream(
+            *({"data": c} for c in "abcdefg"),
+            {"current_tool_use": {"name": "list_certificates"}},
+            *({"data": c} for c in "hi"),
+        )
+        mock_agent_class.return_value = mock_agent_instance
+        mock_mcp_client.return_value = MagicMock()
+
+        agent = VaultPKIAgent()
+        events = [
+            event
+            async for event in agent.query_stream(
+                "Test query", batch_ms=60_000, max_batch=4
+            )
+        ]
+
+        assert [event.get("data") for event in events] == [
+            "a",
+            "bc",
+            "defg",
+            None,
+            "hi",
+        ]
+        assert events[3]["_kind"] is EventKind.TOOL_USE
+
+    @patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+    @patch("src.agent.vault_pki_agent.OpenAIModel")
+    @patch("src.agent.vault_pki_agent.MCPClient")
+    @patch("src.agent.vault_pki_agent.Agent")
+    async def test_query_max_tokens_override(
+        self, mock_agent_class, mock_mcp_client, mock_openai_model
+    ):
+        """Test a per-query max_tokens cap uses a capped model for that query only."""
+        models = []
+
+        async def stream_async(prompt):
+            models.append(mock_agent_instance.model)
+            yield {"data": "ok"}
+
+        mock_agent_instance = Mock()
+        mock_agent_instance.stream_async = stream_async
+        mock_agent_class.return_value = mock_agent_instance
+        mock_mcp_client.return_value = MagicMock()
+        mock_openai_model.side_effect = lambda **kwargs: Mock(params=kwargs["params"])
+
+        agent = VaultPKIAgent()
+        await agent.query("What can I ask?", max_tokens=150)
+        await agent.query("Test query")
+
+        assert agent.model.params["max_tokens"] == 1000
+        assert models[0].params["max_tokens"] == 150
+        assert models[1] is agent.model
+        assert mock_agent_instance.model is agent.model
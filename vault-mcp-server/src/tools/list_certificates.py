@@ -48,6 +48,10 @@ def register_list_certificates_tool(mcp: FastMCP) -> None:
         returns simplified certificate data including subject CN, expiration status,
         revocation status, days until expiry, and issuer hierarchy.
 
+        To answer questions about expiring or revoked certificates across Vault,
+        call this tool for each engine returned by list_pki_secrets_engines and
+        filter on the "expiring_in" and "revoked" fields.
+
         Args:
             pki_mount_path: Mount path of the PKI secrets engine (e.g., 'pki', 'pki_int').
                            Must contain only alphanumeric characters, underscores, and hyphens.